@@ -0,0 +1,296 @@
+import os
+import re
+import base64
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from PIL import Image, ImageDraw, features
+from astrbot.api import logger
+from .cache import DiskLRUCache, SingleFlight
+from .constant import ASSET_FETCH_CONCURRENCY
+from .http_session import HttpSessionManager
+from .native_renderer import GALLERY_WIDTH, GRID_GAP, gallery_layout
+from .utils import bili_temp_path, run_image_task
+
+# 富文本中的表情图片，如 <img src='https://i0.hdslb.com/...png'>
+IMG_SRC_RE = re.compile(r"""(<img\s[^>]*?src=['"])([^'"]+)(['"])""", re.IGNORECASE)
+# 渲染数据中直接存放图片地址的字段
+IMAGE_FIELDS = ("avatar", "pendant")
+# 模板中图片的显示尺寸：单图区两侧各留 20px，转发内容只显示一张图
+SINGLE_IMAGE_BOX = (GALLERY_WIDTH - 16, 1280)
+FORWARD_IMAGE_BOX = (GALLERY_WIDTH - 16, 480)
+CELL_RADIUS = 12
+# 缩略图与拼图的编码格式，WebP 体积小且保留透明圆角
+PREP_FORMAT = "WEBP" if features.check("webp") else "PNG"
+PREP_QUALITY = 85
+
+
+def _sniff_mime(head: bytes) -> str:
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if head.startswith(b"GIF8"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def _data_uri_sync(path: str) -> str:
+    with open(path, "rb") as f:
+        data = f.read()
+    return f"data:{_sniff_mime(data[:12])};base64,{base64.b64encode(data).decode()}"
+
+
+def _write_bytes_sync(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _open_scaled(path: str, box: Tuple[int, int]) -> Image.Image:
+    """解码并等比缩小到 box 内。JPEG 直接以接近目标的尺寸解码，不展开原图。"""
+    image = Image.open(path)
+    image.draft("RGB", box)
+    image = image.convert(
+        "RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB"
+    )
+    image.thumbnail(box, Image.LANCZOS, reducing_gap=2.0)
+    return image
+
+
+def _downscale_sync(src: str, out: str, box: Tuple[int, int]) -> bool:
+    _open_scaled(src, box).save(out, PREP_FORMAT, quality=PREP_QUALITY)
+    return True
+
+
+def _collage_sync(paths: List[str], out: str, cols: int, cell: int) -> bool:
+    """按模板九宫格的布局（列数、间距、圆角、居中）把多张图拼成一张透明底的图片。"""
+    rows = (len(paths) + cols - 1) // cols
+    width = cols * cell + (cols - 1) * GRID_GAP
+    height = rows * cell + (rows - 1) * GRID_GAP
+    canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    for i, path in enumerate(paths):
+        image = _open_scaled(path, (cell, cell)).convert("RGBA")
+        mask = Image.new("L", image.size, 0)
+        ImageDraw.Draw(mask).rounded_rectangle(
+            (0, 0, *image.size), CELL_RADIUS, fill=255
+        )
+        mask = Image.composite(image.getchannel("A"), mask, mask)
+        x = (i % cols) * (cell + GRID_GAP) + (cell - image.width) // 2
+        y = (i // cols) * (cell + GRID_GAP) + (cell - image.height) // 2
+        canvas.paste(image, (x, y), mask)
+    canvas.save(out, PREP_FORMAT, quality=PREP_QUALITY)
+    return True
+
+
+def normalize_url(url: str) -> str:
+    """补全 B 站接口常见的协议相对地址。"""
+    return f"https:{url}" if url.startswith("//") else url
+
+
+def is_remote(url: Any) -> bool:
+    return isinstance(url, str) and url.startswith(("http://", "https://", "//"))
+
+
+class AssetCache:
+    """
+    渲染引用的远程图片（头像、挂件、封面、配图、表情）的本地缓存。
+    以 URL 的哈希为键存放在磁盘上，按总大小做 LRU 淘汰；同一图片的并发下载只进行一次。
+    渲染前通过 localize() 将渲染数据中的远程地址替换为本地文件或内联的 Data URI。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        http: Optional[HttpSessionManager] = None,
+        concurrency: int = ASSET_FETCH_CONCURRENCY,
+    ):
+        self.cache = DiskLRUCache(directory, max_bytes, suffix=".img")
+        self.http = http
+        self.failures = 0
+        self._flight = SingleFlight()
+        self._sem = asyncio.Semaphore(concurrency)
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    async def fetch(self, url: str) -> Optional[str]:
+        """返回图片的本地路径，未缓存时下载。下载失败返回 None。"""
+        url = normalize_url(url)
+        key = self.key(url)
+        path = self.cache.get(key)
+        if path:
+            return path
+        return await self._flight.do(key, lambda: self._download(key, url))
+
+    async def _download(self, key: str, url: str) -> Optional[str]:
+        if self.http is None:
+            return None
+        tmp = bili_temp_path("asset_", ".img")
+        try:
+            async with self._sem:
+                async with self.http.session.get(url, timeout=10) as resp:
+                    if resp.status != 200:
+                        self.failures += 1
+                        return None
+                    data = await resp.read()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, _write_bytes_sync, tmp, data)
+            return self.cache.put(key, tmp)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"下载渲染素材失败 ({url}): {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return None
+
+    async def variant(
+        self, key: str, build: Callable[[str], Awaitable[Any]]
+    ) -> Optional[str]:
+        """
+        获取由已缓存素材派生的图片（缩略图、拼图），不存在时调用 build(输出路径) 生成。
+        """
+        path = self.cache.get(key)
+        if path:
+            return path
+
+        async def make() -> Optional[str]:
+            tmp = bili_temp_path("asset_", ".img")
+            try:
+                await build(tmp)
+                return self.cache.put(key, tmp)
+            except Exception as e:
+                logger.warning(f"处理渲染素材失败: {e}")
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                return None
+
+        return await self._flight.do(key, make)
+
+    async def thumbnail(self, url: str, box: Tuple[int, int]) -> Optional[str]:
+        """返回缩小到显示尺寸的图片路径。"""
+        src = await self.fetch(url)
+        if not src:
+            return None
+        key = self.key(f"thumb|{normalize_url(url)}|{box[0]}x{box[1]}")
+        return await self.variant(
+            key, lambda out: run_image_task(_downscale_sync, src, out, box)
+        )
+
+    async def collage(self, paths: List[str], cols: int, cell: int) -> Optional[str]:
+        """将多张缩略图按九宫格布局拼成一张图片。"""
+        names = "|".join(os.path.basename(p) for p in paths)
+        key = self.key(f"collage|{names}|{cols}|{cell}")
+        return await self.variant(
+            key, lambda out: run_image_task(_collage_sync, paths, out, cols, cell)
+        )
+
+    async def prepare_images(
+        self, render_data: Dict[str, Any], collage: bool = False
+    ) -> Dict[str, Any]:
+        """
+        并发下载正文配图与转发配图并缩小到模板中的显示尺寸，
+        collage 为 True 时将多图拼成一张，模板只需显示一张图片。
+        处理失败的图片保留原地址。
+        """
+        data = dict(render_data)
+        urls = data.get("image_urls") or []
+        if any(is_remote(u) for u in urls):
+            cols, cell = gallery_layout(len(urls), GALLERY_WIDTH)
+            box = SINGLE_IMAGE_BOX if len(urls) == 1 else (cell, cell)
+            thumbs = await asyncio.gather(
+                *(self.thumbnail(u, box) for u in urls if is_remote(u))
+            )
+            it = iter(thumbs)
+            thumbs = [next(it) if is_remote(u) else None for u in urls]
+            data["image_urls"] = [t or u for u, t in zip(urls, thumbs)]
+            if collage and len(urls) > 1 and all(thumbs):
+                merged = await self.collage(thumbs, cols, cell)
+                if merged:
+                    data["image_urls"] = [merged]
+        forward = data.get("forward")
+        if (
+            forward
+            and forward.get("image_urls")
+            and is_remote(forward["image_urls"][0])
+        ):
+            thumb = await self.thumbnail(forward["image_urls"][0], FORWARD_IMAGE_BOX)
+            if thumb:
+                data["forward"] = dict(forward, image_urls=[thumb])
+        return data
+
+    def is_cached_file(self, path: Any) -> bool:
+        """是否为缓存目录中的文件（prepare_images 生成的缩略图与拼图）。"""
+        if not isinstance(path, str) or not os.path.isabs(path):
+            return False
+        directory = os.path.realpath(self.cache.directory)
+        path = os.path.realpath(path)
+        return os.path.dirname(path) == directory and os.path.isfile(path)
+
+    def collect_urls(self, render_data: Dict[str, Any]) -> List[str]:
+        """
+        列出渲染数据（含转发内容）引用的全部远程图片地址，以及配图中缓存目录内的文件。
+        正文来自 UP主 的动态，其中的本地路径一律不读取。
+        """
+        urls = []
+        for data in (render_data, render_data.get("forward") or {}):
+            urls.extend(
+                u for u in data.get("image_urls") or [] if self.is_cached_file(u)
+            )
+            candidates = [data.get(field) for field in IMAGE_FIELDS]
+            candidates.extend(data.get("image_urls") or [])
+            candidates.extend(
+                m.group(2) for m in IMG_SRC_RE.finditer(data.get("text") or "")
+            )
+            urls.extend(u for u in candidates if is_remote(u))
+        return list(dict.fromkeys(urls))
+
+    async def localize(
+        self, render_data: Dict[str, Any], inline: bool = True
+    ) -> Dict[str, Any]:
+        """
+        并发预取渲染数据引用的图片，返回替换为本地副本后的新渲染数据。
+        inline 为 True 时替换为 Data URI（HTML 渲染可能在远程服务中进行，无法读取本地文件），
+        否则替换为本地文件路径。下载失败的图片保留原地址。
+        """
+        urls = self.collect_urls(render_data)
+        if not urls:
+            return render_data
+        paths = await asyncio.gather(
+            *(self.fetch(u) if is_remote(u) else asyncio.sleep(0, u) for u in urls)
+        )
+        mapping: Dict[str, str] = {}
+        for url, path in zip(urls, paths):
+            if not path or (path == url and not inline):
+                continue
+            try:
+                mapping[url] = (
+                    await run_image_task(_data_uri_sync, path) if inline else path
+                )
+            except OSError:
+                continue  # 文件在读取前被淘汰
+        return self._replace(render_data, mapping)
+
+    def _replace(self, data: Dict[str, Any], mapping: Dict[str, str]) -> Dict[str, Any]:
+        data = dict(data)
+        for field in IMAGE_FIELDS:
+            if data.get(field) in mapping:
+                data[field] = mapping[data[field]]
+        if data.get("image_urls"):
+            data["image_urls"] = [mapping.get(u, u) for u in data["image_urls"]]
+        if data.get("text"):
+
+            def sub(m: "re.Match") -> str:
+                # 正文中只替换远程地址，本地路径原样保留
+                src = m.group(2)
+                if is_remote(src):
+                    src = mapping.get(src, src)
+                return m.group(1) + src + m.group(3)
+
+            data["text"] = IMG_SRC_RE.sub(sub, data["text"])
+        if data.get("forward"):
+            data["forward"] = self._replace(data["forward"], mapping)
+        return data
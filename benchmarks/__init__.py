@@ -0,0 +1,4 @@
+"""
+离线性能基准。在插件目录的上一级运行，例如:
+    cd data/plugins && python -m astrbot_plugin_bilibili.benchmarks.bench_event_loop
+"""
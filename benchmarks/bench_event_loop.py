@@ -0,0 +1,100 @@
+"""
+事件循环延迟基准：模拟 50 次渲染后处理（截图裁剪、二维码、Base64 编码）的突发，
+对比在事件循环中直接执行与放入图片执行器执行时，其它协程感受到的调度延迟。
+"""
+
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from PIL import Image
+
+from .. import utils
+
+BURST = 50
+TICK = 0.001
+
+
+def _make_screenshot(path: str):
+    """生成一张与动态卡片截图尺寸相近的图片。"""
+    image = Image.new("RGB", (760, 1600), "#F2F6FF")
+    photo = Image.effect_noise((680, 680), 48).convert("RGB")
+    image.paste(photo, (40, 600))
+    image.save(path)
+
+
+def _inline_job(src: str, out: str):
+    utils._crop_image_sync(src, out, 700)
+    utils._create_qrcode_sync(f"https://t.bilibili.com/{os.getpid()}")
+    utils._image_to_base64_sync(out)
+
+
+async def _executor_job(src: str, out: str):
+    await utils.get_and_crop_image(src, out)
+    await utils.create_qrcode(f"https://t.bilibili.com/{os.getpid()}")
+    await utils.image_to_base64(out)
+
+
+async def _measure(run_burst) -> dict:
+    """在突发期间用一个 1ms 的心跳协程测量事件循环延迟。"""
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - start - TICK)
+
+    tick_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await run_burst()
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick_task
+    lags.sort()
+    return {
+        "elapsed_s": elapsed,
+        "lag_p50_ms": statistics.median(lags) * 1000,
+        "lag_p99_ms": lags[int(len(lags) * 0.99) - 1] * 1000,
+        "lag_max_ms": lags[-1] * 1000,
+    }
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "screenshot.png")
+        _make_screenshot(src)
+        outs = [os.path.join(tmp, f"out_{i}.png") for i in range(BURST)]
+
+        async def inline_burst():
+            for out in outs:
+                await asyncio.sleep(0)
+                _inline_job(src, out)
+
+        async def executor_burst():
+            await asyncio.gather(*(_executor_job(src, out) for out in outs))
+
+        results = {"inline (before)": await _measure(inline_burst)}
+        for kind in ("thread", "process"):
+            utils.configure_image_executor(kind, 4)
+            try:
+                results[f"{kind} executor (after)"] = await _measure(executor_burst)
+            finally:
+                utils.shutdown_image_executor()
+
+    print(f"burst of {BURST} renders")
+    print(
+        f"{'mode':<26}{'total s':>9}{'lag p50 ms':>12}{'lag p99 ms':>12}{'lag max ms':>12}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<26}{r['elapsed_s']:>9.2f}{r['lag_p50_ms']:>12.2f}"
+            f"{r['lag_p99_ms']:>12.2f}{r['lag_max_ms']:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,199 @@
+"""
+热路径基准：用 fixtures/dynamics_new.json 中按 get_dynamics_new 返回格式整理的各类动态
+（视频、图文、纯文字、专栏、转发、充电专属、互动抽奖、置顶），逐阶段测量
+动态解析与过滤、渲染数据构建、富文本解析、二维码生成，以及经本地 t2i 桩服务的完整渲染。
+每个阶段报告 ops/s、单次耗时与内存分配（tracemalloc 统计的单次峰值与多次执行后的残留），
+全程离线运行。可保存结果并在升级前后对比:
+    python -m astrbot_plugin_bilibili.benchmarks.bench_hot_path --save before.json
+    python -m astrbot_plugin_bilibili.benchmarks.bench_hot_path --compare before.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import time
+import tracemalloc
+
+from aiohttp import web
+from PIL import Image
+
+from astrbot.api import logger
+
+from .. import utils
+from ..http_session import HttpSessionManager
+from ..listener import DynamicListener
+from ..renderer import Renderer
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "dynamics_new.json")
+WINDOW = 0.2  # 每轮计时至少运行的秒数
+REPEAT = 5  # 计时轮数，取最快的一轮以减小抖动
+ALLOC_ROUNDS = 20
+STUB_PORT = 18799
+
+
+def _stub_png() -> bytes:
+    """t2i 桩服务返回的截图，尺寸与真实动态卡片相近。"""
+    image = Image.new("RGB", (760, 1400), "#F2F6FF")
+    image.paste(Image.effect_noise((680, 680), 48).convert("RGB"), (40, 560))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+async def _start_stub_t2i() -> web.AppRunner:
+    png = _stub_png()
+
+    async def generate(request: web.Request):
+        await request.read()
+        return web.Response(body=png, content_type="image/png")
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/generate", generate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", STUB_PORT).start()
+    return runner
+
+
+async def _timeit(func) -> dict:
+    """每轮重复执行直到累计 WINDOW 秒，取 REPEAT 轮中最快的一轮，返回 ops/s 与单次耗时。"""
+    await func()  # 预热
+    best = float("inf")
+    for _ in range(REPEAT):
+        count = 0
+        start = time.perf_counter()
+        while True:
+            await func()
+            count += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= WINDOW:
+                break
+        best = min(best, elapsed / count)
+    return {"ops": 1 / best, "us": best * 1e6}
+
+
+async def _allocations(func) -> dict:
+    """单次执行的内存分配峰值，以及 ALLOC_ROUNDS 次执行后未释放的内存（KiB）。"""
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        peaks = []
+        for _ in range(ALLOC_ROUNDS):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await func()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_kib": sum(peaks) / len(peaks) / 1024,
+        "retained_kib": (retained - base) / 1024,
+    }
+
+
+async def _stage(func) -> dict:
+    result = await _timeit(func)
+    result.update(await _allocations(func))
+    return result
+
+
+async def main(save: str, compare: str):
+    with open(FIXTURES, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+    logger.setLevel(logging.WARNING)  # 过滤命中时的日志不计入输出
+    runner = await _start_stub_t2i()
+    http = HttpSessionManager()
+    renderer = Renderer(
+        None, True, f"http://127.0.0.1:{STUB_PORT}", http=http, backend="html"
+    )
+    listener = DynamicListener(
+        context=None,
+        data_manager=None,
+        bili_client=None,
+        renderer=renderer,
+        interval_mins=20,
+        rai=True,
+        node=False,
+    )
+    sub = {"last": "", "filter_types": [], "filter_regex": [r"抽奖|周边"]}
+    results = {}
+    try:
+        for name, payload in cases.items():
+            item = listener._latest_item(payload)
+
+            async def parse():
+                await listener._parse_and_filter_dynamics(payload, sub)
+
+            results[f"parse_and_filter/{name}"] = await _stage(parse)
+            if listener._describe_item(item)["blocked"]:
+                continue  # 充电专属动态不会构建渲染数据
+
+            async def build():
+                await renderer.build_render_data(item)
+
+            results[f"build_render_data/{name}"] = await _stage(build)
+
+        summary = cases["draw"]["items"][0]["modules"]["module_dynamic"]
+        summary, topic = summary["major"]["opus"]["summary"], summary["topic"]
+
+        async def rich_text():
+            await utils.parse_rich_text(summary, topic)
+
+        results["parse_rich_text"] = await _stage(rich_text)
+
+        counter = iter(range(10**9))
+
+        async def qrcode_cold():
+            await utils.create_qrcode(f"https://t.bilibili.com/{next(counter)}")
+
+        async def qrcode_cached():
+            await utils.create_qrcode("https://t.bilibili.com/1120000000000000001")
+
+        results["create_qrcode/cold"] = await _stage(qrcode_cold)
+        results["create_qrcode/cached"] = await _stage(qrcode_cached)
+
+        render_data = await listener._build_dynamic_render_data(
+            listener._latest_item(cases["forward"])
+        )
+
+        async def render():
+            async with renderer.render(render_data) as path:
+                assert path, "渲染失败"
+
+        results["render/forward (stub t2i)"] = await _stage(render)
+    finally:
+        await http.close()
+        await runner.cleanup()
+
+    baseline = {}
+    if compare:
+        with open(compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(
+        f"{'stage':<34}{'ops/s':>11}{'us/op':>11}{'peak KiB':>10}{'kept KiB':>10}"
+        + (f"{'vs base':>9}" if baseline else "")
+    )
+    for name, r in results.items():
+        line = (
+            f"{name:<34}{r['ops']:>11.0f}{r['us']:>11.1f}"
+            f"{r['peak_kib']:>10.1f}{r['retained_kib']:>10.1f}"
+        )
+        if name in baseline:
+            line += f"{r['ops'] / baseline[name]['ops'] - 1:>+9.0%}"
+        print(line)
+    if save:
+        with open(save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--save", default="", help="将结果保存为 JSON")
+    parser.add_argument("--compare", default="", help="与之前保存的结果对比")
+    args = parser.parse_args()
+    asyncio.run(main(args.save, args.compare))
@@ -0,0 +1,117 @@
+"""
+卡片渲染基准：对比 Pillow 原生绘制与 HTML 渲染（t2i 服务）的单张卡片延迟与本进程 CPU 时间。
+HTML 渲染需要可访问的 t2i 服务，通过参数传入地址，例如:
+    python -m astrbot_plugin_bilibili.benchmarks.bench_native_render --t2i http://127.0.0.1:8999
+未提供时只测量原生绘制。字体可用 --font 指定，默认自动查找中文字体。
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import aiohttp
+from PIL import Image
+
+from .. import utils
+from ..native_renderer import NativeCardRenderer, find_font
+from ..renderer import HTML_TEMPLATE
+
+ROUNDS = 20
+
+
+async def _sample_cards():
+    """开播通知、视频信息与九宫格图文三种卡片，图片均为本地生成的 data URI。"""
+    cover = await utils.image_to_base64(Image.new("RGB", (1146, 717), "#88AADD"))
+    pic = await utils.image_to_base64(Image.new("RGB", (800, 800), "#DDAA88"))
+    qrcode = await utils.create_qrcode("https://live.bilibili.com/23353816")
+    logo = await utils.logo_data_uri()
+    base = await utils.create_render_data()
+    live = dict(
+        base,
+        name="直面泰山Bot",
+        avatar=logo,
+        title="晚间杂谈",
+        text="📣 你订阅的UP 「某位UP主」 开播了！",
+        image_urls=[cover],
+        qrcode=qrcode,
+    )
+    video = dict(
+        base,
+        name="直面泰山Bot",
+        avatar=logo,
+        title="一个视频标题",
+        text="UP 主: 某位UP主<br>播放量: 123456<br>点赞: 2345<br>投币: 345<br>总共 12 人正在观看",
+        image_urls=[cover],
+    )
+    draw = dict(
+        base,
+        name="某位UP主",
+        avatar=logo,
+        text="今天的照片<br>" + "这是一段比较长的动态正文。" * 12,
+        image_urls=[pic] * 9,
+        qrcode=qrcode,
+    )
+    return {"live": live, "video": video, "draw (9 pics)": draw}
+
+
+async def _measure(render_once) -> dict:
+    latencies = []
+    cpu_start = time.process_time()
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        await render_once()
+        latencies.append(time.perf_counter() - start)
+    cpu = (time.process_time() - cpu_start) / ROUNDS
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "cpu_ms": cpu * 1000,
+    }
+
+
+async def main(t2i_url: str, font: str):
+    font_path = find_font(font) or font
+    if not font_path:
+        print("未找到支持中文的字体，请使用 --font 指定字体文件")
+        return
+    native = NativeCardRenderer(font_path)
+    native.font_path = font_path  # --font 指定的非中文字体也允许用于测量
+    cards = await _sample_cards()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "card.png")
+        for name, data in cards.items():
+
+            async def native_once():
+                await native.render(data, out)
+
+            results[f"{name} / native"] = await _measure(native_once)
+            if not t2i_url:
+                continue
+            async with aiohttp.ClientSession() as session:
+
+                async def html_once():
+                    path = await utils.bili_html_render(
+                        HTML_TEMPLATE, data, t2i_url, session
+                    )
+                    os.remove(path)
+
+                results[f"{name} / html"] = await _measure(html_once)
+
+    print(f"{ROUNDS} rounds per card, font: {font_path}")
+    print(f"{'card / backend':<26}{'p50 ms':>10}{'max ms':>10}{'cpu ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<26}{r['p50_ms']:>10.1f}{r['max_ms']:>10.1f}{r['cpu_ms']:>10.1f}")
+    if not t2i_url:
+        print("html: skipped (pass --t2i to compare)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--t2i", default="", help="t2i 服务地址")
+    parser.add_argument("--font", default="", help="字体文件路径")
+    args = parser.parse_args()
+    asyncio.run(main(args.t2i, args.font))
@@ -0,0 +1,101 @@
+"""
+输出格式基准：对纯文字卡片与九宫格图文卡片，比较各输出格式的文件大小与编码耗时。
+卡片由原生渲染器绘制，配图为本地生成的带噪点渐变图（接近照片的压缩特性）。
+    python -m astrbot_plugin_bilibili.benchmarks.bench_output_format --font /path/to/font.ttf
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from PIL import Image
+
+from .. import utils
+from ..constant import OUTPUT_FORMATS
+from ..native_renderer import NativeCardRenderer, find_font
+
+ROUNDS = 10
+QUALITY = 85
+
+
+def _photo(size, seed: int) -> Image.Image:
+    """渐变叠加高斯噪点，模拟照片。"""
+    w, h = size
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 40 + seed * 5)
+    r = Image.blend(gradient, noise, 0.35)
+    g = Image.blend(gradient.rotate(90), noise, 0.25)
+    b = Image.effect_mandelbrot(size, (-2, -1.2, 0.8 + seed * 0.05, 1.2), 64)
+    return Image.merge("RGB", (r, g, b))
+
+
+async def _sample_cards():
+    logo = await utils.logo_data_uri()
+    qrcode = await utils.create_qrcode("https://t.bilibili.com/1000000000000000000")
+    base = await utils.create_render_data()
+    text = dict(
+        base,
+        name="某位UP主",
+        avatar=logo,
+        type="DYNAMIC_TYPE_WORD",
+        text="今天的碎碎念<br>" + "这是一段只有文字的动态正文。" * 20,
+        qrcode=qrcode,
+    )
+    pics = [
+        await utils.image_to_base64(_photo((800, 800), i), "image/jpeg")
+        for i in range(9)
+    ]
+    draw = dict(
+        base,
+        name="某位UP主",
+        avatar=logo,
+        type="DYNAMIC_TYPE_DRAW",
+        text="今天的照片<br>" + "出门拍了一些照片。" * 6,
+        image_urls=pics,
+        qrcode=qrcode,
+    )
+    return {"text": text, "draw (9 pics)": draw}
+
+
+def _measure(image: Image.Image, fmt: str, path: str) -> dict:
+    times = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        utils.save_image(image, path, fmt, QUALITY)
+        times.append(time.perf_counter() - start)
+    return {
+        "kb": os.path.getsize(path) / 1024,
+        "ms": statistics.median(times) * 1000,
+    }
+
+
+async def main(font: str):
+    font_path = find_font(font) or font
+    if not font_path:
+        print("未找到支持中文的字体，请使用 --font 指定字体文件")
+        return
+    native = NativeCardRenderer(font_path)
+    native.font_path = font_path
+    cards = await _sample_cards()
+    print(f"{ROUNDS} rounds per format, quality {QUALITY}, font: {font_path}")
+    print(f"{'card':<16}{'format':<8}{'size KB':>10}{'encode ms':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, data in cards.items():
+            card_path = os.path.join(tmp, "card.png")
+            await native.render(data, card_path)
+            with Image.open(card_path) as image:
+                image.load()
+            for fmt, suffix in OUTPUT_FORMATS.items():
+                r = _measure(image, fmt, os.path.join(tmp, f"out{suffix}"))
+                print(f"{name:<16}{fmt:<8}{r['kb']:>10.1f}{r['ms']:>12.1f}")
+            print(f"{'':<16}size: {image.width}x{image.height}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--font", default="", help="字体文件路径")
+    args = parser.parse_args()
+    asyncio.run(main(args.font))
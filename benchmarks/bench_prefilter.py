@@ -0,0 +1,126 @@
+"""
+消息预筛基准：在不含 B 站内容的消息语料上，对比每条消息在
+BV 正则匹配与小程序卡片解析两个入口上的开销（旧实现 vs 预筛后）。
+当前固定版本的 AstrBot 已将 Json 消息段解析为 dict，字符串卡片一栏只在旧版框架上出现；
+dict 卡片一栏对应实际运行的路径，预筛只读取卡片来源字段。
+"""
+
+import json
+import random
+import re
+import time
+
+from .. import utils
+from ..constant import BV
+
+# 修改前的 BV 正则，用于对比
+OLD_BV = r"(?:\?.*)?(?:https?:\/\/)?(?:www\.)?bilibili\.com\/video\/(BV[\w\d]+)\/?(?:\?.*)?|BV[\w\d]+"
+MESSAGES = 20000
+CARDS = 5000
+REPEAT = 5
+
+WORDS = [
+    "今天",
+    "晚上",
+    "吃什么",
+    "哈哈哈",
+    "有人打游戏吗",
+    "?",
+    "??? 什么情况",
+    "https://github.com/AstrBotDevs/AstrBot",
+    "https://www.zhihu.com/question/123456",
+    "B站今天好卡",
+    "bilibili 大会员",
+    "Bv号是什么",
+    "收到",
+    "[图片]",
+    "@某人 看一下这个",
+]
+
+
+def _messages(rng: random.Random):
+    out = []
+    for _ in range(MESSAGES):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+        if rng.random() < 0.05:
+            text = "?" + text * 4  # 以问号开头的长消息
+        out.append(text)
+    return out
+
+
+def _cards(rng: random.Random):
+    out = []
+    for i in range(CARDS):
+        card = {
+            "app": rng.choice(
+                ["com.tencent.music.lua", "com.tencent.map", "com.tencent.miniapp_01"]
+            ),
+            "meta": {
+                "music": {"title": f"歌曲 {i}", "jumpUrl": f"https://y.qq.com/n/{i}"},
+                "detail_1": {
+                    "title": "腾讯地图",
+                    "desc": "位置分享" * rng.randint(1, 20),
+                },
+            },
+            "prompt": "[分享]" + rng.choice(WORDS),
+        }
+        out.append(json.dumps(card, ensure_ascii=False))
+    return out
+
+
+def _old_miniapp(json_string):
+    if isinstance(json_string, str):
+        parsed_data = json.loads(json_string)
+    else:
+        parsed_data = json_string
+    meta = parsed_data.get("meta", {})
+    detail_1 = meta.get("detail_1", {})
+    news = meta.get("news", {})
+    return detail_1.get("title") == "哔哩哔哩" or news.get("tag") == "哔哩哔哩"
+
+
+def _new_miniapp(json_string):
+    if not utils.maybe_bili_miniapp(json_string):
+        return False
+    return _old_miniapp(json_string)
+
+
+def _bench(func, corpus) -> float:
+    """返回每条消息的最优耗时（纳秒）。"""
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter_ns()
+        for item in corpus:
+            func(item)
+        best = min(best, (time.perf_counter_ns() - start) / len(corpus))
+    return best
+
+
+def main():
+    rng = random.Random(0)
+    messages = _messages(rng)
+    cards = _cards(rng)
+    card_dicts = [json.loads(c) for c in cards]
+    old_bv = re.compile(OLD_BV)
+    new_bv = re.compile(BV)
+    # 框架的 RegexFilter 以 match 方式匹配去除首尾空白后的消息
+    assert not any(new_bv.match(m.strip()) for m in messages)
+    assert not any(_new_miniapp(c) for c in cards)
+    assert not any(_new_miniapp(c) for c in card_dicts)
+
+    rows = [
+        ("BV regex (before)", _bench(lambda m: old_bv.match(m.strip()), messages)),
+        ("BV regex (after)", _bench(lambda m: new_bv.match(m.strip()), messages)),
+        ("miniapp json (before)", _bench(_old_miniapp, cards)),
+        ("miniapp json (after)", _bench(_new_miniapp, cards)),
+        ("miniapp dict (before)", _bench(_old_miniapp, card_dicts)),
+        ("miniapp dict (after)", _bench(_new_miniapp, card_dicts)),
+    ]
+    print(f"{MESSAGES} chat messages, {CARDS} non-bilibili cards")
+    print(f"{'stage':<24}{'ns/msg':>10}")
+    for name, ns in rows:
+        print(f"{name:<24}{ns:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
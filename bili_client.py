@@ -1,7 +1,30 @@
-import aiohttp
+import asyncio
+from urllib.parse import urlparse
 from astrbot.api import logger
-from typing import Optional, Dict, Any, Tuple
+from typing import Awaitable, Callable, Optional, Dict, Any, Tuple, List
 from bilibili_api import user, Credential, video
+from bilibili_api.exceptions import ResponseCodeException
+from .cache import LRUCache, SingleFlight
+from .constant import (
+    B23_CACHE_SIZE,
+    LIVE_STATUS_API,
+    PROFILE_CACHE_SIZE,
+    PROFILE_FETCH_CONCURRENCY,
+    PROFILE_TTL,
+    RATE_LIMIT_DEFAULTS,
+    RISK_BACKOFF_BASE,
+    RISK_RETRIES,
+    VIDEO_CACHE_SIZE,
+    VIDEO_TTL,
+)
+from .http_session import HttpSessionManager
+from .metrics import metrics
+from .ratelimit import (
+    RISK_CONTROL_CODES,
+    EndpointLimiter,
+    error_code,
+    risk_control_code,
+)
 
 
 class BiliClient:
@@ -9,16 +32,143 @@ class BiliClient:
     负责所有与 Bilibili API 的交互。
     """
 
-    def __init__(self, sessdata: Optional[str] = None):
+    FAMILIES = ("dynamics", "live", "user", "video")
+
+    def __init__(
+        self,
+        sessdata: Optional[str] = None,
+        live_status_api: str = LIVE_STATUS_API,
+        rate_limits: Optional[Dict[str, Any]] = None,
+        link_store: Optional[Any] = None,
+    ):
         """
         初始化 Bilibili API 客户端。
+        live_status_api: 批量直播状态接口地址，可替换为本地服务用于离线验证
+        rate_limits: 覆盖 RATE_LIMIT_DEFAULTS 中的限流参数
+        link_store: 提供 get_short_link / save_short_link 的持久化存储（如 DataManager），
+            为 None 时 b23 短链解析结果只缓存在内存中
         """
+        self.live_status_api = live_status_api
+        limits = {**RATE_LIMIT_DEFAULTS, **(rate_limits or {})}
+        self.limiters: Dict[str, EndpointLimiter] = {
+            family: EndpointLimiter(
+                family,
+                rate_per_min=limits[f"{family}_per_min"],
+                burst=limits["burst"],
+                backoff_base=RISK_BACKOFF_BASE,
+                backoff_max=limits["backoff_max_secs"],
+                breaker_threshold=limits["breaker_threshold"],
+                cooldown=limits["breaker_cooldown_secs"],
+            )
+            for family in self.FAMILIES
+        }
+        # uid -> {"mid", "name", "face", "sex"}，动态与直播状态的返回顺带填充
+        self.profiles = LRUCache(PROFILE_CACHE_SIZE, ttl=PROFILE_TTL)
+        # bvid -> {"info", "online"}，同一视频短时间内被多次分享时直接复用
+        self.videos = LRUCache(VIDEO_CACHE_SIZE, ttl=VIDEO_TTL)
+        self._video_flight = SingleFlight()
+        # b23 短码 -> 解析后的链接，短链创建后不会再变化
+        self.short_links = LRUCache(B23_CACHE_SIZE)
+        self.link_store = link_store
+        self._link_flight = SingleFlight()
+        # 插件所有直接发出的 HTTP 请求共用此会话
+        self.http = HttpSessionManager()
         self.credential = None
         if sessdata:
             self.credential = Credential(sessdata=sessdata)
         else:
             logger.warning("未提供 SESSDATA，部分需要登录的API可能无法使用。")
 
+    async def close(self):
+        """关闭共享的 HTTP 会话。"""
+        await self.http.close()
+
+    async def _guarded(self, family: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        经过对应接口族的限流器发起请求。
+        触发风控时登记退避并在退避结束后重试，熔断期间抛出 CircuitOpenError。
+        """
+        limiter = self.limiters[family]
+        attempt = 0
+        while True:
+            try:
+                await limiter.acquire()
+                metrics.inc("api_requests_total", endpoint=family)
+                with metrics.timer("api_seconds", endpoint=family):
+                    result = await call()
+            except Exception as e:
+                metrics.inc("api_errors_total", endpoint=family, code=error_code(e))
+                code = risk_control_code(e)
+                if code is None:
+                    raise
+                limiter.on_risk_control(code)
+                if attempt >= RISK_RETRIES:
+                    raise
+                attempt += 1
+                continue
+            limiter.on_success()
+            return result
+
+    def limiter_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {family: lim.stats() for family, lim in self.limiters.items()}
+
+    def _remember_profile(self, uid: Any, **fields: Any):
+        """合并写入 UP 主资料缓存，已有的字段（如性别）不会被部分资料覆盖掉。"""
+        try:
+            uid = int(uid)
+        except (TypeError, ValueError):
+            return
+        profile = dict(self.profiles.peek(uid) or {})
+        profile.update({k: v for k, v in fields.items() if v is not None})
+        profile["mid"] = uid
+        self.profiles.set(uid, profile)
+
+    def _remember_dynamic_authors(self, dyn: Dict[str, Any]):
+        for item in dyn.get("items") or []:
+            for it in (item, item.get("orig") or {}):
+                author = (it.get("modules") or {}).get("module_author") or {}
+                if author.get("mid") and author.get("name"):
+                    self._remember_profile(
+                        author["mid"], name=author["name"], face=author.get("face")
+                    )
+
+    async def get_profile(
+        self, uid: int, full: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        获取 UP 主资料，优先使用缓存。
+        full 为 True 时要求包含性别等仅用户信息接口才有的字段。
+        """
+        profile = self.profiles.get(int(uid))
+        if profile and (not full or "sex" in profile):
+            return profile, ""
+        info, msg = await self.get_user_info(uid)
+        if not info:
+            return None, msg
+        return self.profiles.peek(int(uid)), ""
+
+    async def get_profiles(
+        self, uids: List[int], concurrency: int = PROFILE_FETCH_CONCURRENCY
+    ) -> Dict[int, Optional[Dict[str, Any]]]:
+        """批量获取 UP 主资料，缓存未命中的 UID 以有限并发同时请求。"""
+        result: Dict[int, Optional[Dict[str, Any]]] = {}
+        misses = []
+        for uid in map(int, uids):
+            profile = self.profiles.get(uid)
+            if profile:
+                result[uid] = profile
+            else:
+                misses.append(uid)
+        sem = asyncio.Semaphore(concurrency)
+
+        async def resolve(uid: int):
+            async with sem:
+                info, _ = await self.get_user_info(uid)
+            result[uid] = self.profiles.peek(uid) if info else None
+
+        await asyncio.gather(*(resolve(uid) for uid in misses))
+        return result
+
     async def get_user(self, uid: int) -> user.User:
         """
         根据UID获取一个 User 对象。
@@ -28,15 +178,26 @@ class BiliClient:
     async def get_video_info(self, bvid: str) -> Optional[Dict[str, Any]]:
         """
         获取视频的详细信息和在线观看人数。
+        结果短暂缓存，同一 BV 的并发查询共享一次请求。
         """
+        cached = self.videos.get(bvid)
+        if cached:
+            return cached
+        return await self._video_flight.do(bvid, lambda: self._fetch_video_info(bvid))
+
+    async def _fetch_video_info(self, bvid: str) -> Optional[Dict[str, Any]]:
         try:
             v = video.Video(bvid=bvid)
-            info = await v.get_info()
-            online = await v.get_online()
-            return {"info": info, "online": online}
+            info, online = await asyncio.gather(
+                self._guarded("video", v.get_info),
+                self._guarded("video", v.get_online),
+            )
         except Exception as e:
             logger.error(f"获取视频信息失败 (BVID: {bvid}): {e}")
             return None
+        data = {"info": info, "online": online}
+        self.videos.set(bvid, data)
+        return data
 
     async def get_latest_dynamics(self, uid: int) -> Optional[Dict[str, Any]]:
         """
@@ -44,7 +205,9 @@ class BiliClient:
         """
         try:
             u = await self.get_user(uid)
-            return await u.get_dynamics_new()
+            dyn = await self._guarded("dynamics", u.get_dynamics_new)
+            self._remember_dynamic_authors(dyn)
+            return dyn
         except Exception as e:
             logger.error(f"获取用户动态失败 (UID: {uid}): {e}")
             return None
@@ -55,18 +218,66 @@ class BiliClient:
         """
         try:
             u = await self.get_user(uid)
-            return await u.get_live_info()
+            return await self._guarded("live", u.get_live_info)
         except Exception as e:
             logger.error(f"获取直播间信息失败 (UID: {uid}): {e}")
             return None
 
+    async def get_live_status_batch(
+        self, uids: List[int]
+    ) -> Optional[Dict[int, Dict[str, Any]]]:
+        """
+        批量获取多个用户的直播间状态，一次请求即可覆盖多个 UID。
+        返回 uid -> 房间状态，未开通直播间的 UID 不会出现在结果中。
+        """
+        if not uids:
+            return {}
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "Referer": "https://live.bilibili.com/",
+        }
+        params = [("uids[]", str(uid)) for uid in uids]
+
+        async def fetch() -> Dict[str, Any]:
+            async with self.http.session.get(
+                self.live_status_api, params=params, headers=headers, timeout=10
+            ) as resp:
+                resp.raise_for_status()
+                raw = await resp.json(content_type=None)
+            if raw.get("code") in RISK_CONTROL_CODES:
+                raise ResponseCodeException(raw["code"], raw.get("message", ""), raw)
+            return raw
+
+        try:
+            raw = await self._guarded("live", fetch)
+        except Exception as e:
+            logger.error(f"批量获取直播间状态失败 (UID 数: {len(uids)}): {e}")
+            return None
+
+        if raw.get("code") != 0:
+            logger.error(
+                f"批量获取直播间状态失败: {raw.get('code')} {raw.get('message') or raw.get('msg')}"
+            )
+            return None
+        data = raw.get("data") or {}
+        if not isinstance(data, dict):  # 无任何直播间时接口返回空列表
+            return {}
+        for uid, status in data.items():
+            self._remember_profile(
+                uid, name=status.get("uname"), face=status.get("face")
+            )
+        return {int(uid): status for uid, status in data.items()}
+
     async def get_user_info(self, uid: int) -> Optional[Tuple[Dict[str, Any], str]]:
         """
         获取用户的基本信息。
         """
         try:
             u = await self.get_user(uid)
-            info = await u.get_user_info()
+            info = await self._guarded("user", u.get_user_info)
+            self._remember_profile(
+                uid, name=info["name"], face=info["face"], sex=info["sex"]
+            )
             return info, ""
         except Exception as e:
             if "code" in e.args[0] and e.args[0]["code"] == -404:
@@ -78,14 +289,46 @@ class BiliClient:
 
     async def b23_to_bv(self, url: str) -> Optional[str]:
         """
-        b23短链转换为原始链接
+        b23短链转换为原始链接。
+        解析结果依次缓存在内存与持久化存储中，同一短链的并发解析只请求一次。
         """
+        code = urlparse(url).path.strip("/")
+        if not code:
+            return await self._resolve_b23(url)
+        cached = self.short_links.get(code)
+        if cached:
+            return cached
+        return await self._link_flight.do(code, lambda: self._lookup_b23(code, url))
+
+    async def _lookup_b23(self, code: str, url: str) -> Optional[str]:
+        if self.link_store:
+            try:
+                resolved = await self.link_store.get_short_link(code)
+            except Exception as e:
+                logger.warning(f"读取短链缓存失败 ({code}): {e}")
+                resolved = None
+            if resolved:
+                self.short_links.set(code, resolved)
+                return resolved
+        resolved = await self._resolve_b23(url)
+        if resolved and resolved != url:
+            self.short_links.set(code, resolved)
+            if self.link_store:
+                try:
+                    await self.link_store.save_short_link(code, resolved)
+                except Exception as e:
+                    logger.warning(f"保存短链缓存失败 ({code}): {e}")
+        return resolved
+
+    async def _resolve_b23(self, url: str) -> Optional[str]:
+        """请求 b23 短链并返回重定向的目标地址（去除查询参数）。"""
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(
+        metrics.inc("api_requests_total", endpoint="b23")
+        try:
+            with metrics.timer("api_seconds", endpoint="b23"):
+                async with self.http.session.get(
                     url=url, headers=headers, allow_redirects=False, timeout=10
                 ) as response:
                     if 300 <= response.status < 400:
@@ -93,6 +336,7 @@ class BiliClient:
                         if location_url:
                             base_url = location_url.split("?", 1)[0]
                             return base_url
-            except Exception as e:
-                logger.error(f"解析b23链接失败 (URL: {url}): {e}")
-                return url
+        except Exception as e:
+            metrics.inc("api_errors_total", endpoint="b23", code=error_code(e))
+            logger.error(f"解析b23链接失败 (URL: {url}): {e}")
+            return url
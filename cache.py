@@ -0,0 +1,290 @@
+import os
+import time
+import shutil
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from astrbot.api import logger
+
+
+class LRUCache:
+    """
+    容量有限的内存 LRU 缓存，记录命中率。
+    ttl 不为 None 时，条目在写入 ttl 秒后过期。
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._expires: Dict[Hashable, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """读取但不计入命中率、不调整 LRU 顺序。"""
+        if key in self._data and not self._expired(key):
+            return self._data[key]
+        return default
+
+    def _expired(self, key: Hashable) -> bool:
+        if self.ttl is None or self._expires[key] > time.monotonic():
+            return False
+        del self._data[key]
+        del self._expires[key]
+        return True
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key in self._data and not self._expired(key):
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        self._expires[key] = time.monotonic() + (self.ttl or 0)
+        while len(self._data) > self.maxsize:
+            old, _ = self._data.popitem(last=False)
+            del self._expires[old]
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class SingleFlight:
+    """
+    合并对同一个键的并发调用：进行中的调用结束前，后到的调用方共享同一个结果。
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._calls.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(func())
+            self._calls[key] = fut
+            fut.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.shared += 1
+        # 某个调用方被取消时不影响其他等待同一结果的调用方
+        return await asyncio.shield(fut)
+
+
+class DiskLRUCache:
+    """
+    以内容哈希为键的磁盘文件缓存，按总字节数做 LRU 淘汰。
+    最近访问顺序通过文件 mtime 持久化，重启后仍然有效。
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ".png"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> 文件大小
+        self._pins: Dict[str, int] = {}  # key -> 正在使用该文件的任务数
+        self._size = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """扫描缓存目录，按 mtime 恢复 LRU 顺序。"""
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append(
+                (st.st_mtime, name[: len(name) - len(self.suffix)], st.st_size)
+            )
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+        self._evict()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def get(self, key: str) -> Optional[str]:
+        """命中时返回缓存文件路径，并将其标记为最近使用。"""
+        if key in self._entries:
+            path = self.path_for(key)
+            try:
+                os.utime(path)
+            except OSError:
+                # 文件已被外部删除
+                self._size -= self._entries.pop(key)
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return path
+        self.misses += 1
+        return None
+
+    def put(self, key: str, src_path: str) -> str:
+        """将 src_path 移入缓存并返回缓存中的路径。"""
+        path = self.path_for(key)
+        shutil.move(src_path, path)
+        size = os.path.getsize(path)
+        self._size += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+        self._evict()
+        return path
+
+    def pin(self, key: str):
+        """标记文件正在使用（如等待发送），淘汰时跳过。"""
+        self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, key: str):
+        count = self._pins.get(key, 0) - 1
+        if count > 0:
+            self._pins[key] = count
+        else:
+            self._pins.pop(key, None)
+        self._evict()
+
+    def _evict(self):
+        if self._size <= self.max_bytes:
+            return
+        # 至少保留最新的一项，正在使用的文件不淘汰
+        for key in list(self._entries)[:-1]:
+            if self._size <= self.max_bytes:
+                break
+            if key in self._pins:
+                continue
+            self._size -= self._entries.pop(key)
+            self.evictions += 1
+            try:
+                os.remove(self.path_for(key))
+            except OSError as e:
+                logger.warning(f"删除缓存文件失败 ({key}): {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class TempJanitor:
+    """
+    临时目录的后台清理任务，定期删除过期文件，并在总大小超过上限时从最旧的文件开始删除。
+    最近 grace 秒内写入的文件可能仍在渲染或等待发送，超出大小上限时也不删除。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_age: float,
+        max_bytes: int,
+        interval: float,
+        grace: float = 300,
+    ):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.grace = grace
+        self.runs = 0
+        self.expired = 0  # 因过期删除的文件数
+        self.evictions = 0  # 因超出大小上限删除的文件数
+        self.freed_bytes = 0
+        self.files = 0
+        self.bytes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def sweep(self):
+        """扫描一次目录并执行清理（同步，在线程池中调用）。"""
+        now = time.time()
+        files = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file():
+                            st = entry.stat()
+                            files.append((st.st_mtime, st.st_size, entry.path))
+                    except OSError:
+                        continue
+        except FileNotFoundError:
+            files = []
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        kept = 0
+        for mtime, size, path in files:
+            age = now - mtime
+            if age > self.max_age:
+                reason = "expired"
+            elif total > self.max_bytes and age > self.grace:
+                reason = "evicted"
+            else:
+                kept += 1
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                total -= size  # 已被发送流程删除
+                continue
+            except OSError as e:
+                logger.warning(f"清理临时文件失败 ({path}): {e}")
+                kept += 1
+                continue
+            total -= size
+            self.freed_bytes += size
+            if reason == "expired":
+                self.expired += 1
+            else:
+                self.evictions += 1
+        self.runs += 1
+        self.files = kept
+        self.bytes = total
+
+    def start(self):
+        """启动后台清理任务，启动时先清理一次。"""
+
+        async def _loop():
+            loop = asyncio.get_running_loop()
+            while True:
+                try:
+                    await loop.run_in_executor(None, self.sweep)
+                except Exception as e:
+                    logger.error(f"清理临时目录失败: {e}")
+                await asyncio.sleep(self.interval)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(_loop())
+
+    async def close(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "runs": self.runs,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "freed_bytes": self.freed_bytes,
+        }
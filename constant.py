@@ -1,17 +1,71 @@
 import os
 
 CURRENT_DIR = os.path.dirname(__file__)
+TEMP_DIR = os.path.join(CURRENT_DIR, "temp")
 LOGO_PATH = os.path.join(CURRENT_DIR, "Astrbot.png")
-BV = r"(?:\?.*)?(?:https?:\/\/)?(?:www\.)?bilibili\.com\/video\/(BV[\w\d]+)\/?(?:\?.*)?|BV[\w\d]+"
+# 由框架以 match 方式匹配消息开头。BV 号固定为 "BV" + 10 位字母数字，
+# 不使用开头的可选分组，非视频消息在前几个字符处即可判定失败
+BV = r"(?:https?://)?(?:www\.)?bilibili\.com/video/(BV[0-9A-Za-z]{10})|(BV[0-9A-Za-z]{10})"
+# B 站分享卡片的链接必然是 b23.tv 短链或 bilibili 域名，不含这些子串时跳过 JSON 解析
+MINIAPP_HINTS = ("bili", "b23.tv")
+# 已解析的卡片中 B 站分享的来源标识（meta.detail_1.title / meta.news.tag）
+MINIAPP_SOURCE = "哔哩哔哩"
 VALID_FILTER_TYPES = {"forward", "lottery", "video", "article", "draw", "live"}
 DATA_PATH = "data/astrbot_plugin_bilibili.json"
+FLUSH_INTERVAL = 5  # 订阅数据合并写入数据库的间隔（秒）
 DEFAULT_CFG = {
     "bili_sub_list": {}  # sub_user -> [{"uid": "uid", "last": "last_dynamic_id", ...}]
 }
 TEMPLATE_PATH = os.path.join(CURRENT_DIR, "template.html")
-IMG_PATH = "data/temp.png"
+LIVE_STATUS_API = "https://api.live.bilibili.com/room/v1/Room/get_status_info_by_uids"
+LIVE_BATCH_SIZE = 50  # 每次批量查询直播状态的 UID 数
+HTTP_POOL_LIMIT = 100  # 共享 HTTP 会话的总连接数上限
+HTTP_POOL_LIMIT_PER_HOST = 8  # 每个主机的连接数上限
+HTTP_KEEPALIVE = 30  # 空闲连接保持时间（秒）
+QRCODE_CACHE_SIZE = 1024  # 缓存的二维码数量
+PROFILE_CACHE_SIZE = 2048  # 缓存的 UP 主资料数量
+PROFILE_TTL = 6 * 3600  # UP 主资料（昵称、头像、性别）的缓存时间（秒）
+PROFILE_FETCH_CONCURRENCY = 8  # 批量解析 UP 主资料时的并发请求数
+VIDEO_CACHE_SIZE = 256  # 缓存的视频信息数量
+VIDEO_TTL = 30  # 视频信息（播放量、在线人数）的缓存时间（秒）
+B23_CACHE_SIZE = 1024  # 内存中缓存的 b23 短链解析结果数量
+B23_DISK_CACHE_SIZE = 10000  # 数据库中保留的 b23 短链解析结果数量
+ASSET_FETCH_CONCURRENCY = 8  # 预取渲染素材时的并发下载数
+TEMP_SWEEP_INTERVAL = 600  # 临时目录的清理间隔（秒）
+# 渲染结果可选的输出格式及文件后缀，png8 为调色板量化后的 PNG
+OUTPUT_FORMATS = {"png": ".png", "png8": ".png", "jpeg": ".jpg", "webp": ".webp"}
+# 各类卡片默认的输出格式，可通过配置项 output_format 覆盖。
+# text 为不含配图的卡片，notice 为开播、视频信息、订阅成功等通知卡片
+OUTPUT_FORMAT_DEFAULTS = {
+    "text": "png8",
+    "draw": "jpeg",
+    "video": "jpeg",
+    "article": "jpeg",
+    "forward": "jpeg",
+    "notice": "jpeg",
+    "quality": 85,
+}
+# 各接口族的默认限流参数，可通过配置项 rate_limits 覆盖
+RATE_LIMIT_DEFAULTS = {
+    "dynamics_per_min": 60,
+    "live_per_min": 30,
+    "user_per_min": 30,
+    "video_per_min": 60,
+    "burst": 5,
+    "backoff_max_secs": 300,
+    "breaker_threshold": 3,
+    "breaker_cooldown_secs": 600,
+}
+RISK_BACKOFF_BASE = 5  # 首次风控的退避时间（秒），之后指数增长
+RISK_RETRIES = 1  # 风控后在退避结束时的重试次数
 MAX_ATTEMPTS = 3
 RETRY_DELAY = 2
+POLL_JITTER = 0.05  # 调度抖动，占轮询间隔的比例
+POLL_SYNC_SECONDS = 10  # 调度器检查订阅变化的最长间隔
+TIER_HISTORY = 20  # 每个 UP主 保留的发布/开播记录数
+TIER_HOT_WINDOW = 6 * 3600  # 最近活动在此时间内视为 hot
+TIER_HOT_POSTS_PER_DAY = 3  # 24 小时内发布数达到此值视为 hot
+TIER_WARM_WINDOW = 7 * 86400  # 最近活动在此时间内视为 warm，否则为 cold
 
 category_mapping = {
     "全部": "ALL",
@@ -1,21 +1,63 @@
 import json
 import os
-from typing import Dict, List, Any, Optional
+import time
+import asyncio
+import sqlite3
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Set, Tuple
 from astrbot.api import logger
-from .constant import DEFAULT_CFG, DATA_PATH
+from .constant import B23_DISK_CACHE_SIZE, DATA_PATH, FLUSH_INTERVAL
+from .filters import CompiledFilter
 from astrbot.api.star import StarTools
 
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    session TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    last TEXT,
+    is_live INTEGER NOT NULL DEFAULT 0,
+    filter_types TEXT NOT NULL DEFAULT '[]',
+    filter_regex TEXT NOT NULL DEFAULT '[]',
+    extra TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (session, uid)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS short_links (
+    code TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    used REAL NOT NULL
+);
+"""
+# 订阅字典中有独立列的字段，其余字段存入 extra
+SUB_COLUMNS = ("uid", "last", "is_live", "filter_types", "filter_regex")
+# 使用 ON CONFLICT 原地更新而非 INSERT OR REPLACE（后者会删除重插，改变 rowid 与加载顺序）
+UPSERT_SQL = (
+    "INSERT INTO subscriptions "
+    "(session, uid, last, is_live, filter_types, filter_regex, extra) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (session, uid) DO UPDATE SET "
+    "last = excluded.last, is_live = excluded.is_live, "
+    "filter_types = excluded.filter_types, filter_regex = excluded.filter_regex, "
+    "extra = excluded.extra"
+)
+
 
 class DataManager:
     """
     负责管理插件的订阅数据，包括加载、保存和修改。
+    数据存储在 SQLite (WAL 模式) 中，每条订阅一行，
+    更新游标或直播状态只需写入单行。
+    内存中按 (session, uid) 与 uid -> sessions 建立索引，UID 统一为 int。
+    修改只标记为脏数据，由后台定时或在轮询结束时合并为一次事务写入。
     """
 
     def __init__(self):
-        standard_data_path = os.path.join(
-            StarTools.get_data_dir(plugin_name="astrbot_plugin_bilibili"),
-            "astrbot_plugin_bilibili.json",
-        )
+        data_dir = StarTools.get_data_dir(plugin_name="astrbot_plugin_bilibili")
+        standard_data_path = os.path.join(data_dir, "astrbot_plugin_bilibili.json")
         if os.path.exists(DATA_PATH) and not os.path.exists(standard_data_path):
             # 复制旧数据文件到标准路径
             os.makedirs(os.path.dirname(standard_data_path), exist_ok=True)
@@ -23,33 +65,265 @@ class DataManager:
                 with open(standard_data_path, "w", encoding="utf-8") as dst:
                     dst.write(src.read())
             logger.info(f"已将旧数据文件迁移到标准路径: {standard_data_path}")
+        # JSON 数据文件：首次启动时导入数据库，之后作为备份的导出路径
         self.path = standard_data_path
-        self.data = self._load_data()
+        self.db_path = os.path.join(data_dir, "astrbot_plugin_bilibili.db")
+        self.db = self._open_db()
+        # session -> {uid -> 订阅}，保持添加顺序
+        self._subs: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        # uid -> 订阅了该 UP主 的 session 集合
+        self._by_uid: Dict[int, Set[str]] = {}
+        # session 的第三段 (群号/用户号) -> session 集合，用于管理员按 SID 查找
+        self._by_sid: Dict[str, Set[str]] = {}
+        # (session, uid) -> 预编译的过滤条件
+        self._filters: Dict[Tuple[str, int], CompiledFilter] = {}
+        self._load_data()
+        self.version = 0  # 订阅增删时递增，供监听器判断是否需要重新分组
+        # 待写入的 (session, uid)，写入时不存在于内存中的视为删除
+        self._dirty: Set[Tuple[str, int]] = set()
+        self._flush_lock = asyncio.Lock()
+        # 数据库写入在单独的线程中串行执行，不阻塞事件循环
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="bili_data"
+        )
+        self._flush_task: Optional[asyncio.Task] = None
 
-    def _load_data(self) -> Dict[str, Any]:
+    def _open_db(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # 自动提交模式，批量写入时显式开启事务
+        conn = sqlite3.connect(
+            self.db_path, isolation_level=None, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _load_data(self):
         """
-        从 JSON 文件加载数据。如果文件不存在，则创建并使用默认配置。
+        从数据库加载数据并建立索引。首次启动时自动导入已有的 JSON 数据文件。
         """
-        if not os.path.exists(self.path):
-            logger.info(f"数据文件不存在，将创建于: {self.path}")
-            # 确保目录存在
-            os.makedirs(os.path.dirname(self.path), exist_ok=True)
-            with open(self.path, "w", encoding="utf-8-sig") as f:
-                json.dump(DEFAULT_CFG, f, ensure_ascii=False, indent=4)
-            return DEFAULT_CFG
+        imported = self.db.execute(
+            "SELECT value FROM meta WHERE key = 'json_imported'"
+        ).fetchone()
+        if not imported:
+            self._import_json()
+
+        rows = self.db.execute(
+            "SELECT session, uid, last, is_live, filter_types, filter_regex, extra "
+            "FROM subscriptions ORDER BY rowid"
+        )
+        for session, uid, last, is_live, types, regex, extra in rows:
+            sub = json.loads(extra)
+            sub.update(
+                {
+                    "uid": uid,
+                    "last": last,
+                    "is_live": bool(is_live),
+                    "filter_types": json.loads(types),
+                    "filter_regex": json.loads(regex),
+                }
+            )
+            self._index(session, sub)
+
+    @staticmethod
+    def _sid_of(sub_user: str) -> str:
+        parts = sub_user.split(":", 2)
+        return parts[2] if len(parts) > 2 else sub_user
+
+    def _index(self, sub_user: str, sub: Dict[str, Any]):
+        uid = int(sub["uid"])
+        sub["uid"] = uid
+        if sub_user not in self._subs:
+            self._subs[sub_user] = {}
+            self._by_sid.setdefault(self._sid_of(sub_user), set()).add(sub_user)
+        self._subs[sub_user][uid] = sub
+        self._by_uid.setdefault(uid, set()).add(sub_user)
+        self._filters[(sub_user, uid)] = CompiledFilter.from_sub(sub)
+
+    def _unindex(self, sub_user: str, uid: int):
+        user_subs = self._subs.get(sub_user, {})
+        user_subs.pop(uid, None)
+        self._filters.pop((sub_user, uid), None)
+        sessions = self._by_uid.get(uid)
+        if sessions is not None:
+            sessions.discard(sub_user)
+            if not sessions:
+                del self._by_uid[uid]
+        # 如果该用户已无任何订阅，移除该用户键
+        if not user_subs and sub_user in self._subs:
+            del self._subs[sub_user]
+            sid = self._sid_of(sub_user)
+            self._by_sid[sid].discard(sub_user)
+            if not self._by_sid[sid]:
+                del self._by_sid[sid]
+
+    def _import_json(self):
+        """将 JSON 数据文件中的订阅导入数据库，原文件保留作为备份。"""
+        count = 0
+        self.db.execute("BEGIN")
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8-sig") as f:
+                    data = json.load(f)
+                for sub_user, subs in data.get("bili_sub_list", {}).items():
+                    for sub in subs:
+                        self._upsert(sub_user, sub)
+                        count += 1
+            self.db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', '1')"
+            )
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        if count:
+            logger.info(f"已从 {self.path} 导入 {count} 条订阅到 {self.db_path}")
+
+    @staticmethod
+    def _row(sub_user: str, sub: Dict[str, Any]) -> tuple:
+        extra = {k: v for k, v in sub.items() if k not in SUB_COLUMNS}
+        return (
+            sub_user,
+            int(sub["uid"]),
+            sub.get("last"),
+            int(bool(sub.get("is_live", False))),
+            json.dumps(sub.get("filter_types", []), ensure_ascii=False),
+            json.dumps(sub.get("filter_regex", []), ensure_ascii=False),
+            json.dumps(extra, ensure_ascii=False),
+        )
+
+    def _upsert(self, sub_user: str, sub: Dict[str, Any]):
+        self.db.execute(UPSERT_SQL, self._row(sub_user, sub))
+
+    def _mark_dirty(self, sub_user: str, uid: int):
+        self._dirty.add((sub_user, int(uid)))
+
+    def _write_rows(self, upserts: List[tuple], deletes: List[Tuple[str, int]]):
+        """在写入线程中将一批修改作为单个事务提交。"""
+        self.db.execute("BEGIN")
+        try:
+            if upserts:
+                self.db.executemany(UPSERT_SQL, upserts)
+            if deletes:
+                self.db.executemany(
+                    "DELETE FROM subscriptions WHERE session = ? AND uid = ?", deletes
+                )
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def _select_short_link(self, code: str) -> Optional[str]:
+        row = self.db.execute(
+            "SELECT url FROM short_links WHERE code = ?", (code,)
+        ).fetchone()
+        if row is None:
+            return None
+        self.db.execute(
+            "UPDATE short_links SET used = ? WHERE code = ?", (time.time(), code)
+        )
+        return row[0]
 
-        with open(self.path, "r", encoding="utf-8-sig") as f:
-            return json.load(f)
+    def _write_short_link(self, code: str, url: str):
+        self.db.execute("BEGIN")
+        try:
+            self.db.execute(
+                "INSERT OR REPLACE INTO short_links (code, url, used) VALUES (?, ?, ?)",
+                (code, url, time.time()),
+            )
+            # 只保留最近使用的若干条
+            self.db.execute(
+                "DELETE FROM short_links WHERE code NOT IN "
+                "(SELECT code FROM short_links ORDER BY used DESC LIMIT ?)",
+                (B23_DISK_CACHE_SIZE,),
+            )
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
 
-    async def save(self):
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
+    async def get_short_link(self, code: str) -> Optional[str]:
+        """
+        查询已持久化的 b23 短链解析结果。
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._select_short_link, code)
+
+    async def save_short_link(self, code: str, url: str):
+        """
+        持久化 b23 短链解析结果，超出容量时淘汰最久未使用的记录。
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._write_short_link, code, url)
+
+    async def flush(self):
+        """
+        将所有脏数据合并为一次事务写入数据库。
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+            upserts, deletes = [], []
+            for sub_user, uid in dirty:
+                sub = self.get_subscription(sub_user, uid)
+                if sub is None:
+                    deletes.append((sub_user, uid))
+                else:
+                    upserts.append(self._row(sub_user, sub))
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(
+                    self._executor, self._write_rows, upserts, deletes
+                )
+            except Exception:
+                # 写入失败时保留脏标记，下次重试
+                self._dirty |= dirty
+                raise
+
+    def start_autoflush(self, interval: float = FLUSH_INTERVAL):
+        """启动后台定时写入任务。"""
+
+        async def _loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.error(f"写入订阅数据失败: {e}\n{traceback.format_exc()}")
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(_loop())
+
+    @staticmethod
+    def _write_json_atomic(path: str, data: Dict[str, Any]):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    async def export_json(self, path: Optional[str] = None) -> str:
+        """
+        将全部订阅导出为 JSON 文件用于备份，默认写入原 JSON 数据文件路径。
+        先写入临时文件再原子替换，写入中断也不会破坏已有备份。
+        """
+        path = path or self.path
+        data = {"bili_sub_list": self.get_all_subscriptions()}
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._write_json_atomic, path, data)
+        return path
 
     def get_all_subscriptions(self) -> Dict[str, List[Dict[str, Any]]]:
         """
         获取所有的订阅列表。
         """
-        return self.data.get("bili_sub_list", {})
+        return {
+            sub_user: list(user_subs.values())
+            for sub_user, user_subs in self._subs.items()
+        }
 
     def get_subscriptions_by_user(
         self, sub_user: str
@@ -58,29 +332,48 @@ class DataManager:
         根据 sub_user 获取其订阅的UP主列表。
         sub_user: 订阅用户的唯一标识, 形如 "aipcqhttp:GroupMessage:123456"
         """
-        return self.get_all_subscriptions().get(sub_user)
+        user_subs = self._subs.get(sub_user)
+        return list(user_subs.values()) if user_subs else None
 
     def get_subscription(self, sub_user: str, uid: int) -> Optional[Dict[str, Any]]:
         """
         获取特定用户对特定UP主的订阅信息。
         """
-        user_subs = self.get_subscriptions_by_user(sub_user)
-        if user_subs:
-            for sub in user_subs:
-                if sub.get("uid") == str(uid) or sub.get("uid") == uid:
-                    return sub
-        return None
+        return self._subs.get(sub_user, {}).get(int(uid))
+
+    def get_filter(self, sub_user: str, uid: int) -> CompiledFilter:
+        """
+        获取订阅预编译的过滤条件。
+        """
+        flt = self._filters.get((sub_user, int(uid)))
+        if flt is None:
+            flt = CompiledFilter([], [])
+        return flt
+
+    def get_subscribers(self, uid: int) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        获取订阅了某个UP主的所有 (sub_user, 订阅信息)。
+        """
+        uid = int(uid)
+        return [
+            (sub_user, self._subs[sub_user][uid])
+            for sub_user in self._by_uid.get(uid, ())
+        ]
+
+    def get_subscribed_uids(self) -> Set[int]:
+        """
+        获取所有被订阅的UP主 UID。
+        """
+        return set(self._by_uid)
 
     async def add_subscription(self, sub_user: str, sub_data: Dict[str, Any]):
         """
         为用户添加一条新的订阅。
         """
-        all_subs = self.get_all_subscriptions()
-        if sub_user not in all_subs:
-            all_subs[sub_user] = []
-
-        all_subs[sub_user].append(sub_data)
-        await self.save()
+        self._index(sub_user, sub_data)
+        self.version += 1
+        self._mark_dirty(sub_user, sub_data["uid"])
+        await self.flush()
 
     async def update_subscription(
         self, sub_user: str, uid: int, filter_types: List[str], filter_regex: List[str]
@@ -92,7 +385,9 @@ class DataManager:
         if sub:
             sub["filter_types"] = filter_types
             sub["filter_regex"] = filter_regex
-            await self.save()
+            self._filters[(sub_user, int(uid))] = CompiledFilter.from_sub(sub)
+            self._mark_dirty(sub_user, uid)
+            await self.flush()
             return True
         return False
 
@@ -103,7 +398,7 @@ class DataManager:
         sub = self.get_subscription(sub_user, uid)
         if sub:
             sub["last"] = dyn_id
-            await self.save()
+            self._mark_dirty(sub_user, uid)
 
     async def update_live_status(self, sub_user: str, uid: int, is_live: bool):
         """
@@ -112,51 +407,56 @@ class DataManager:
         sub = self.get_subscription(sub_user, uid)
         if sub:
             sub["is_live"] = is_live
-            await self.save()
+            self._mark_dirty(sub_user, uid)
 
     async def remove_subscription(self, sub_user: str, uid: int) -> bool:
         """
         移除一条订阅。
         """
-        user_subs = self.get_subscriptions_by_user(sub_user)
-        if not user_subs:
+        if self.get_subscription(sub_user, uid) is None:
             return False
 
-        sub_to_remove = None
-        for sub in user_subs:
-            if sub.get("uid") == uid:
-                sub_to_remove = sub
-                break
-
-        if sub_to_remove:
-            user_subs.remove(sub_to_remove)
-            # 如果该用户已无任何订阅，可以选择移除该用户键
-            if not user_subs:
-                del self.data["bili_sub_list"][sub_user]
-            await self.save()
-            return True
-
-        return False
+        self._unindex(sub_user, int(uid))
+        self.version += 1
+        self._mark_dirty(sub_user, uid)
+        await self.flush()
+        return True
 
     async def remove_all_for_user(self, sid: str):
         """
         移除一个用户的所有订阅（用于管理员指令）。
         """
-        candidate = []
-        for sub_user in self.get_all_subscriptions():
-            third = sub_user.split(":")[2]
-            if third == str(sid) or sid == sub_user:
-                candidate.append(sub_user)
+        candidate = set(self._by_sid.get(str(sid), ()))
+        if sid in self._subs:
+            candidate.add(sid)
 
         if not candidate:
             msg = "未找到订阅"
             return msg
 
         if len(candidate) == 1:
-            self.data["bili_sub_list"].pop(candidate[0])
-            await self.save()
+            sub_user = candidate.pop()
+            for uid in list(self._subs[sub_user]):
+                self._unindex(sub_user, uid)
+                self._mark_dirty(sub_user, uid)
+            self.version += 1
+            await self.flush()
             msg = f"删除 {sid} 订阅成功"
             return msg
 
-        msg = "找到多个订阅者: " + ", ".join(candidate)
+        msg = "找到多个订阅者: " + ", ".join(sorted(candidate))
         return msg
+
+    async def close(self):
+        """停止定时写入，写入剩余的脏数据并关闭数据库。"""
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+            self.db.close()
@@ -0,0 +1,87 @@
+import re
+from typing import Any, Dict, List, Optional, Pattern
+from astrbot.api import logger
+
+# 过滤类型 -> 位掩码
+FILTER_BITS = {
+    "forward": 1 << 0,
+    "lottery": 1 << 1,
+    "video": 1 << 2,
+    "article": 1 << 3,
+    "draw": 1 << 4,
+    "live": 1 << 5,
+}
+
+
+def types_mask(filter_types: List[str]) -> int:
+    mask = 0
+    for name in filter_types:
+        mask |= FILTER_BITS.get(name, 0)
+    return mask
+
+
+def find_invalid_pattern(patterns: List[str]) -> Optional[str]:
+    """
+    检查正则表达式列表，返回第一个无效表达式的错误描述，全部有效时返回 None。
+    """
+    for pattern in patterns:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            return f"{pattern} ({e})"
+    return None
+
+
+class CompiledFilter:
+    """
+    预编译的订阅过滤条件。
+    过滤类型编译为位掩码；不含捕获组的正则合并为一个交替表达式用于快速排除，
+    含捕获组的正则（合并后组号会改变，反向引用将失效）逐个匹配。
+    """
+
+    __slots__ = ("mask", "patterns", "_combined", "_compiled", "_merged")
+
+    def __init__(self, filter_types: List[str], filter_regex: List[str]):
+        self.mask = types_mask(filter_types)
+        self.patterns: List[str] = []
+        self._compiled: List[Pattern] = []
+        for pattern in filter_regex:
+            try:
+                self._compiled.append(re.compile(pattern))
+                self.patterns.append(pattern)
+            except re.error as e:
+                logger.warning(f"忽略无效的过滤正则 {pattern}: {e}")
+        # 每条正则是否已包含在合并表达式中
+        self._merged: List[bool] = [c.groups == 0 for c in self._compiled]
+        self._combined: Optional[Pattern] = None
+        mergeable = [p for p, m in zip(self.patterns, self._merged) if m]
+        if len(mergeable) > 1:
+            try:
+                self._combined = re.compile("|".join(f"(?:{p})" for p in mergeable))
+            except re.error:
+                pass  # 如不在开头的内联标志
+        if self._combined is None:
+            self._merged = [False] * len(self._compiled)
+
+    @classmethod
+    def from_sub(cls, sub: Dict[str, Any]) -> "CompiledFilter":
+        return cls(sub.get("filter_types", []), sub.get("filter_regex", []))
+
+    def blocks(self, mask: int) -> bool:
+        """item 的类型位与过滤类型有交集时返回 True。"""
+        return bool(self.mask & mask)
+
+    def search(self, text: str) -> Optional[str]:
+        """返回第一个匹配 text 的正则，无匹配时返回 None。"""
+        if not self._compiled or not text:
+            return None
+        # 合并后的表达式只用于快速排除，命中后再确定具体是哪一条
+        merged_hit = self._combined is not None and bool(self._combined.search(text))
+        for pattern, compiled, merged in zip(
+            self.patterns, self._compiled, self._merged
+        ):
+            if merged and not merged_hit:
+                continue
+            if compiled.search(text):
+                return pattern
+        return None
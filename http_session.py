@@ -0,0 +1,47 @@
+import ssl
+import aiohttp
+import certifi
+from functools import lru_cache
+from typing import Optional
+from .constant import HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_KEEPALIVE
+
+
+@lru_cache(maxsize=1)
+def default_ssl_context() -> ssl.SSLContext:
+    """使用 certifi 提供的 CA 证书构建的 SSL 上下文，只创建一次。"""
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+class HttpSessionManager:
+    """
+    插件共享的 aiohttp 会话。
+    复用 keep-alive 连接池与 SSL 上下文，避免每次请求都重新进行 TCP/TLS 握手。
+    """
+
+    def __init__(
+        self,
+        limit: int = HTTP_POOL_LIMIT,
+        limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """获取共享会话，首次使用或关闭后重新创建。"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ssl=default_ssl_context(),
+                keepalive_timeout=HTTP_KEEPALIVE,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trust_env=True)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
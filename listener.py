@@ -1,7 +1,21 @@
-import re
+import time
+import heapq
+import random
 import asyncio
+import itertools
 import traceback
-from typing import Dict, Any, Tuple
+from collections import deque
+from typing import (
+    Dict,
+    Any,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Callable,
+    Awaitable,
+    Iterable,
+)
 from astrbot.api import logger
 from astrbot.api.message_components import Image, Plain, Node
 from astrbot.api.event import MessageEventResult, MessageChain
@@ -9,8 +23,234 @@ from astrbot.api.all import *
 from .data_manager import DataManager
 from .bili_client import BiliClient
 from .renderer import Renderer
+from .filters import FILTER_BITS, CompiledFilter
+from .metrics import metrics
 from .utils import *
-from .constant import LOGO_PATH
+from .constant import (
+    LIVE_BATCH_SIZE,
+    POLL_JITTER,
+    POLL_SYNC_SECONDS,
+    TIER_HISTORY,
+    TIER_HOT_WINDOW,
+    TIER_HOT_POSTS_PER_DAY,
+    TIER_WARM_WINDOW,
+)
+
+
+class PollScheduler:
+    """
+    基于最小堆的轮询调度器。
+    每个 UID 维护一个下次检查时间，新加入的 UID 均匀分散在轮询间隔内，
+    检查通过信号量限制并发，避免每个间隔一次性集中请求。
+    """
+
+    def __init__(
+        self, interval: float, concurrency: int = 4, jitter: float = POLL_JITTER
+    ):
+        """
+        interval: 轮询间隔（秒）
+        concurrency: 同时进行的检查数上限
+        jitter: 调度抖动，占轮询间隔的比例
+        """
+        self.interval = interval
+        self.concurrency = max(1, int(concurrency))
+        self.jitter = jitter
+        self._heap: List[Tuple[float, int, int]] = []  # (due, seq, uid)
+        self._due: Dict[int, float] = {}  # uid -> 当前有效的 due，堆中其余条目视为过期
+        self._seq = itertools.count()
+        self._tasks = set()
+        self._overruns = 0
+        self._max_lag = 0.0
+        self._last_report = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def _push(self, uid: int, due: float):
+        self._due[uid] = due
+        heapq.heappush(self._heap, (due, next(self._seq), uid))
+
+    def _jittered(self, value: float) -> float:
+        return value + random.uniform(-self.jitter, self.jitter) * self.interval
+
+    def sync(self, uids: Iterable[int]):
+        """同步需要轮询的 UID 集合：移除已取消的，新增的均匀分散到一个间隔内。"""
+        uids = set(uids)
+        for uid in set(self._due) - uids:
+            del self._due[uid]
+        new_uids = [uid for uid in uids if uid not in self._due]
+        if not new_uids:
+            return
+        random.shuffle(new_uids)
+        now = time.monotonic()
+        slot = self.interval / len(new_uids)
+        for idx, uid in enumerate(new_uids):
+            self._push(uid, now + slot * (idx + random.random()))
+
+    def reschedule(self, uid: int, delay: float):
+        """将 UID 的下次检查提前或推后到 delay 秒之后。"""
+        if uid in self._due:
+            self._push(uid, time.monotonic() + max(0.0, delay))
+
+    def next_due(self, uid: int) -> Optional[float]:
+        """返回 UID 距离下次检查的秒数。"""
+        due = self._due.get(uid)
+        return None if due is None else due - time.monotonic()
+
+    def _report_overrun(self, lag: float):
+        self._overruns += 1
+        self._max_lag = max(self._max_lag, lag)
+        now = time.monotonic()
+        if now - self._last_report < self.interval:
+            return
+        logger.warning(
+            f"bilibili 轮询超时：最近一个周期内有 {self._overruns} 次检查晚于计划超过一个间隔，"
+            f"最大延迟 {self._max_lag:.1f}s，共 {len(self._due)} 个 UP主，并发上限 {self.concurrency}。"
+        )
+        self._overruns = 0
+        self._max_lag = 0.0
+        self._last_report = now
+
+    async def _run_one(
+        self,
+        uid: int,
+        due: float,
+        check: Callable[[int], Awaitable[Optional[float]]],
+        sem: asyncio.Semaphore,
+    ):
+        interval = self.interval
+        try:
+            interval = await check(uid) or self.interval
+        except Exception as e:
+            logger.error(
+                f"检查 UP主 {uid} 时发生未知错误: {e}\n{traceback.format_exc()}"
+            )
+        finally:
+            sem.release()
+        # 期间 UID 被移除或重新加入时，以新的调度为准
+        if self._due.get(uid) != due:
+            return
+        now = time.monotonic()
+        next_due = self._jittered(due + interval)
+        if next_due <= now:
+            self._report_overrun(now - due)
+            next_due = now
+        self._push(uid, next_due)
+
+    async def run(
+        self,
+        check: Callable[[int], Awaitable[Optional[float]]],
+        refresh: Callable[[], None],
+    ):
+        """
+        调度主循环。
+        check: 检查单个 UID，可返回该 UID 的下次轮询间隔（秒）
+        refresh: 每次唤醒时调用，用于同步订阅变化
+        """
+        sem = asyncio.Semaphore(self.concurrency)
+        try:
+            while True:
+                refresh()
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    due, _, uid = heapq.heappop(self._heap)
+                    if self._due.get(uid) != due:
+                        continue  # 过期条目
+                    lag = now - due
+                    metrics.observe("poll_delay_seconds", max(0.0, lag))
+                    if lag > self.interval:
+                        self._report_overrun(lag)
+                    await sem.acquire()
+                    task = asyncio.create_task(self._run_one(uid, due, check, sem))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                    now = time.monotonic()
+
+                delay = POLL_SYNC_SECONDS
+                if self._heap:
+                    delay = min(delay, max(0.0, self._heap[0][0] - time.monotonic()))
+                await asyncio.sleep(delay)
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+
+
+class ActivityTracker:
+    """
+    记录每个 UP主 最近的动态发布时间与开播历史，并据此划分轮询档位：
+    hot - 最近刚发布/开播或高频发布；warm - 一周内有活动或尚无记录；cold - 长期不活跃。
+    """
+
+    TIERS = ("hot", "warm", "cold")
+
+    def __init__(self, hot_interval: float, warm_interval: float, cold_interval: float):
+        """三个档位的轮询间隔（秒）。"""
+        self.intervals = {
+            "hot": min(hot_interval, warm_interval),
+            "warm": warm_interval,
+            "cold": max(cold_interval, warm_interval),
+        }
+        self._posts: Dict[int, deque] = {}  # uid -> 最近动态发布时间戳（升序）
+        self._live_starts: Dict[int, deque] = {}  # uid -> 最近开播时间戳
+        self._is_live: Dict[int, bool] = {}
+
+    def record_dynamics(self, uid: int, dyn: Dict) -> bool:
+        """记录一次动态拉取结果中的发布时间。返回是否发现了比已知更新的动态。"""
+        stamps = []
+        for item in dyn.get("items", []):
+            try:
+                stamps.append(int(item["modules"]["module_author"]["pub_ts"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+        if not stamps:
+            return False
+        history = self._posts.get(uid)
+        known_latest = history[-1] if history else None
+        merged = sorted(set(history or ()) | set(stamps))
+        self._posts[uid] = deque(merged[-TIER_HISTORY:], maxlen=TIER_HISTORY)
+        return known_latest is not None and merged[-1] > known_latest
+
+    def record_live(self, uid: int, is_live: bool) -> bool:
+        """记录一次直播状态观测，开播时记入历史。返回是否为新观测到的开播。"""
+        started = is_live and not self._is_live.get(uid, False)
+        if started:
+            self._live_starts.setdefault(uid, deque(maxlen=TIER_HISTORY)).append(
+                time.time()
+            )
+        self._is_live[uid] = is_live
+        return started
+
+    def forget(self, uids: Iterable[int]):
+        for uid in uids:
+            self._posts.pop(uid, None)
+            self._live_starts.pop(uid, None)
+            self._is_live.pop(uid, None)
+
+    def last_active(self, uid: int) -> Optional[float]:
+        """最近一次发布动态或开播的时间戳。"""
+        candidates = [
+            h[-1] for h in (self._posts.get(uid), self._live_starts.get(uid)) if h
+        ]
+        return max(candidates) if candidates else None
+
+    def tier(self, uid: int) -> str:
+        if self._is_live.get(uid, False):
+            return "hot"
+        last = self.last_active(uid)
+        if last is None:
+            return "warm"
+        now = time.time()
+        if now - last <= TIER_HOT_WINDOW:
+            return "hot"
+        posts_today = sum(1 for ts in self._posts.get(uid, ()) if now - ts <= 86400)
+        if posts_today >= TIER_HOT_POSTS_PER_DAY:
+            return "hot"
+        if now - last <= TIER_WARM_WINDOW:
+            return "warm"
+        return "cold"
+
+    def interval(self, uid: int) -> float:
+        return self.intervals[self.tier(uid)]
 
 
 class DynamicListener:
@@ -27,6 +267,9 @@ class DynamicListener:
         interval_mins: float,
         rai: bool,
         node: bool,
+        concurrency: int = 4,
+        hot_interval_mins: Optional[float] = None,
+        cold_interval_mins: Optional[float] = None,
     ):
         self.context = context
         self.data_manager = data_manager
@@ -35,47 +278,206 @@ class DynamicListener:
         self.interval_mins = interval_mins
         self.rai = rai  # 非图文动态也可能需要这个配置
         self.node = node
+        self.scheduler = PollScheduler(60 * interval_mins, concurrency)
+        self.activity = ActivityTracker(
+            60 * (hot_interval_mins or interval_mins),
+            60 * interval_mins,
+            60 * (cold_interval_mins or interval_mins),
+        )
+        self._uids: Set[int] = set()
+        self._sub_version = None
 
     async def start(self):
         """启动后台监听循环。"""
-        while True:
+        while self.bili_client.credential is None:
+            logger.warning("bilibili sessdata 未设置，无法获取动态")
             await asyncio.sleep(60 * self.interval_mins)
-            if self.bili_client.credential is None:
-                logger.warning("bilibili sessdata 未设置，无法获取动态")
+
+        await asyncio.gather(
+            self.scheduler.run(self._poll_uid, self._refresh_subscribers),
+            self._live_loop(),
+        )
+
+    async def _live_loop(self):
+        """按活跃档位的间隔批量检查所有订阅 UP主 的直播状态。"""
+        while True:
+            try:
+                with metrics.timer("cycle_seconds", loop="live"):
+                    await self._check_live_batch()
+            except Exception as e:
+                logger.error(
+                    f"批量检查直播状态时发生未知错误: {e}\n{traceback.format_exc()}"
+                )
+            await asyncio.sleep(self.activity.intervals["hot"])
+
+    def _refresh_subscribers(self):
+        """订阅的 UP主 集合发生变化时同步到调度器。"""
+        version = self.data_manager.version
+        if version == self._sub_version:
+            return
+        uids = self.data_manager.get_subscribed_uids()
+        self.activity.forget(self._uids - uids)
+        self._uids = uids
+        self._sub_version = version
+        self.scheduler.sync(uids)
+
+    async def _poll_uid(self, uid: int) -> float:
+        """调度器回调：检查单个 UP主，返回其所在档位的轮询间隔。"""
+        subscribers = self.data_manager.get_subscribers(uid)
+        if subscribers:
+            with metrics.timer("cycle_seconds", loop="dynamics"):
+                await self._check_uid(uid, subscribers)
+        return self.activity.interval(uid)
+
+    def describe_tiers(self, uid: Optional[int] = None) -> List[Dict[str, Any]]:
+        """返回各 UP主 的轮询档位信息，供管理员指令展示。"""
+        self._refresh_subscribers()
+        uids = [uid] if uid is not None else sorted(self._uids)
+        rows = []
+        for u in uids:
+            if u not in self._uids:
                 continue
+            rows.append(
+                {
+                    "uid": u,
+                    "tier": self.activity.tier(u),
+                    "interval": self.activity.interval(u),
+                    "next_due": self.scheduler.next_due(u),
+                    "last_active": self.activity.last_active(u),
+                    "subscribers": len(self.data_manager.get_subscribers(u)),
+                }
+            )
+        return rows
 
-            all_subs = self.data_manager.get_all_subscriptions()
-            for sub_user, sub_list in all_subs.items():
-                for sub_data in sub_list:
-                    try:
-                        await self._check_single_up(sub_user, sub_data)
-                    except Exception as e:
-                        logger.error(
-                            f"处理订阅者 {sub_user} 的 UP主 {sub_data.get('uid', '未知UID')} 时发生未知错误: {e}\n{traceback.format_exc()}"
-                        )
+    async def _check_uid(self, uid: int, subscribers: List[Tuple[str, Dict[str, Any]]]):
+        """检查单个 UP主 的动态更新，并分发给所有订阅了该 UP主 的会话。"""
+        with metrics.timer("stage_seconds", stage="fetch"):
+            dyn = await self.bili_client.get_latest_dynamics(uid)
+        if dyn and self.activity.record_dynamics(uid, dyn):
+            logger.info(
+                f"UP主 {uid} 发布了新动态，轮询档位调整为 {self.activity.tier(uid)}。"
+            )
+        item = self._latest_item(dyn) if dyn else None
+        if item:
+            await self._dispatch_dynamic(item, subscribers)
 
-    async def _check_single_up(self, sub_user: str, sub_data: Dict[str, Any]):
-        """检查单个订阅的UP主是否有更新。"""
-        uid = sub_data.get("uid")
-        if not uid:
+    async def _check_live_batch(self):
+        """分块批量查询直播状态，仅将状态发生变化的订阅交给 _handle_live_status。"""
+        self._refresh_subscribers()
+        live_bit = FILTER_BITS["live"]
+        uids = [
+            uid
+            for uid in self._uids
+            if any(
+                not self.data_manager.get_filter(s, uid).blocks(live_bit)
+                for s, _ in self.data_manager.get_subscribers(uid)
+            )
+        ]
+        try:
+            for i in range(0, len(uids), LIVE_BATCH_SIZE):
+                await self._check_live_chunk(uids[i : i + LIVE_BATCH_SIZE])
+        finally:
+            # 一轮批量检查结束后统一写入直播状态
+            await self.data_manager.flush()
+
+    def _promote(self, uid: int):
+        """UP主 开播后立即按 hot 档位的间隔安排下次动态检查，而不是等到原定的 warm/cold 时间。"""
+        hot = self.activity.intervals["hot"]
+        remaining = self.scheduler.next_due(uid)
+        if remaining is not None and remaining > hot:
+            self.scheduler.reschedule(uid, hot)
+            logger.info(f"UP主 {uid} 开播，轮询档位调整为 hot。")
+
+    async def _check_live_chunk(self, chunk: List[int]):
+        """查询一块 UID 的直播状态并处理状态变化。"""
+        statuses = await self.bili_client.get_live_status_batch(chunk)
+        if not statuses:
             return
+        for uid in chunk:
+            status = statuses.get(uid)
+            if status is None:
+                continue  # 未开通直播间
+            is_live = status.get("live_status") == 1
+            if self.activity.record_live(uid, is_live):
+                self._promote(uid)
+            live_info = None
+            for sub_user, sub_data in self.data_manager.get_subscribers(uid):
+                if self.data_manager.get_filter(sub_user, uid).blocks(
+                    FILTER_BITS["live"]
+                ):
+                    continue
+                if bool(sub_data.get("is_live", False)) == is_live:
+                    continue
+                if live_info is None:
+                    live_info = self._live_info_from_status(status)
+                try:
+                    await self._handle_live_status(sub_user, sub_data, live_info)
+                    metrics.inc("pushes_total", kind="live")
+                except Exception as e:
+                    metrics.inc("push_errors_total", kind="live")
+                    logger.error(
+                        f"推送直播状态给订阅者 {sub_user} (UP主 {uid}) 时发生未知错误: {e}\n{traceback.format_exc()}"
+                    )
+
+    @staticmethod
+    def _live_info_from_status(status: Dict[str, Any]) -> Dict[str, Any]:
+        """将批量直播状态转换为 get_live_info 的结构。"""
+        room_id = status.get("room_id", "")
+        return {
+            "name": status.get("uname", ""),
+            "live_room": {
+                "title": status.get("title", "Unknown"),
+                "cover": status.get("cover_from_user") or status.get("keyframe", ""),
+                "url": f"https://live.bilibili.com/{room_id}",
+                "liveStatus": 1 if status.get("live_status") == 1 else 0,
+            },
+        }
 
-        # 检查动态更新
-        dyn = await self.bili_client.get_latest_dynamics(uid)
-        if dyn:
-            render_data, dyn_id = await self._parse_and_filter_dynamics(dyn, sub_data)
-            if render_data:
-                await self._handle_new_dynamic(sub_user, render_data)
-                await self.data_manager.update_last_dynamic_id(sub_user, uid, dyn_id)
-            elif dyn_id:  # 动态被过滤，只更新ID
-                await self.data_manager.update_last_dynamic_id(sub_user, uid, dyn_id)
-
-        # 检查直播状态
-        if "live" in sub_data.get("filter_types", []):
+    async def _dispatch_dynamic(
+        self, item: Dict, subscribers: List[Tuple[str, Dict[str, Any]]]
+    ):
+        """对同一条动态只解析一次，再按每个订阅者的 last 与过滤条件推送。"""
+        dyn_id = item["id_str"]
+        pending = [
+            (sub_user, sub_data)
+            for sub_user, sub_data in subscribers
+            if sub_data.get("last") != dyn_id
+        ]
+        if not pending:
             return
-        lives = await self.bili_client.get_live_info(uid)
-        if lives:
-            await self._handle_live_status(sub_user, sub_data, lives)
+        info = self._describe_item(item)
+        if info is None:
+            return
+        pub_ts = item["modules"].get("module_author", {}).get("pub_ts")
+
+        render_data = None
+        for sub_user, sub_data in pending:
+            try:
+                flt = self.data_manager.get_filter(sub_user, sub_data["uid"])
+                with metrics.timer("stage_seconds", stage="filter"):
+                    filtered = self._is_filtered(info, flt)
+                if filtered:
+                    metrics.inc("dynamics_filtered_total", category=info["category"])
+                else:
+                    if render_data is None:
+                        with metrics.timer("stage_seconds", stage="build"):
+                            render_data = await self._build_dynamic_render_data(item)
+                    await self._handle_new_dynamic(sub_user, render_data)
+                    metrics.inc("pushes_total", kind="dynamic")
+                    if pub_ts:
+                        metrics.observe(
+                            "push_lag_seconds",
+                            time.time() - int(pub_ts),
+                            kind="dynamic",
+                        )
+                await self.data_manager.update_last_dynamic_id(
+                    sub_user, sub_data["uid"], dyn_id
+                )
+            except Exception as e:
+                metrics.inc("push_errors_total", kind="dynamic")
+                logger.error(
+                    f"推送动态 {dyn_id} 给订阅者 {sub_user} 时发生未知错误: {e}\n{traceback.format_exc()}"
+                )
 
     def _compose_plain_dynamic(
         self, render_data: Dict[str, Any], render_fail: bool = False
@@ -93,6 +495,11 @@ class DynamicListener:
             ls.append(Image.fromURL(pic))
         return ls
 
+    async def _send(self, sub_user: str, message):
+        """发送消息并记录发送耗时。"""
+        with metrics.timer("stage_seconds", stage="send"):
+            await self.context.send_message(sub_user, message)
+
     async def _send_dynamic(
         self, sub_user: str, chain_parts: list, send_node: bool = False
     ):
@@ -102,11 +509,9 @@ class DynamicListener:
                 name="直面泰山Bot",
                 content=chain_parts,
             )
-            await self.context.send_message(
-                sub_user, MessageEventResult(chain=[qqNode])
-            )
+            await self._send(sub_user, MessageEventResult(chain=[qqNode]))
         else:
-            await self.context.send_message(
+            await self._send(
                 sub_user, MessageEventResult(chain=chain_parts).use_t2i(False)
             )
 
@@ -121,23 +526,23 @@ class DynamicListener:
             await self._send_dynamic(sub_user, ls)
         # 默认渲染成图片
         else:
-            img_path = await self.renderer.render_dynamic(render_data)
-            if img_path:
-                url = render_data.get("url", "")
-                ls = [
-                    Image.fromFileSystem(img_path),
-                    Plain(f"{url}"),
-                ]
-                if self.node:
-                    await self._send_dynamic(sub_user, ls, send_node=True)
+            async with self.renderer.render(render_data) as img_path:
+                if img_path:
+                    url = render_data.get("url", "")
+                    ls = [
+                        Image.fromFileSystem(img_path),
+                        Plain(f"{url}"),
+                    ]
+                    if self.node:
+                        await self._send_dynamic(sub_user, ls, send_node=True)
+                    else:
+                        await self._send(
+                            sub_user, MessageEventResult(chain=ls).use_t2i(False)
+                        )
                 else:
-                    await self.context.send_message(
-                        sub_user, MessageEventResult(chain=ls).use_t2i(False)
-                    )
-            else:
-                logger.error("渲染图片失败，尝试发送纯文本消息")
-                ls = self._compose_plain_dynamic(render_data, render_fail=True)
-                await self._send_dynamic(sub_user, ls, send_node=True)
+                    logger.error("渲染图片失败，尝试发送纯文本消息")
+                    ls = self._compose_plain_dynamic(render_data, render_fail=True)
+                    await self._send_dynamic(sub_user, ls, send_node=True)
 
     async def _handle_live_status(self, sub_user: str, sub_data: Dict, live_info: Dict):
         """处理并发送直播状态变更通知。"""
@@ -152,7 +557,7 @@ class DynamicListener:
 
         render_data = await create_render_data()
         render_data["name"] = "直面泰山Bot"
-        render_data["avatar"] = await image_to_base64(LOGO_PATH)
+        render_data["avatar"] = await logo_data_uri()
         render_data["title"] = live_name
         render_data["url"] = link
         render_data["image_urls"] = [cover_url]
@@ -165,34 +570,27 @@ class DynamicListener:
             await self.data_manager.update_live_status(sub_user, sub_data["uid"], False)
         if render_data["text"]:
             render_data["qrcode"] = await create_qrcode(link)
-            img_path = await self.renderer.render_dynamic(render_data)
-            if img_path:
-                await self.context.send_message(
-                    sub_user,
-                    MessageChain().file_image(img_path).message(render_data["url"]),
-                )
-            else:
-                text = "\n".join(filter(None, render_data.get("text", "").split("\n")))
-                await self.context.send_message(
-                    sub_user,
-                    MessageChain()
-                    .message("渲染图片失败了 (´;ω;`)")
-                    .message(text)
-                    .url_image(cover_url),
-                )
-
-    async def _parse_and_filter_dynamics(
-        self, dyn: Dict, data: Dict
-    ) -> Tuple[Any, Any]:
-        """
-        解析并过滤动态。
-        """
-        uid, last = data["uid"], data["last"]
-        filter_types = data.get("filter_types", [])
-        filter_regex = data.get("filter_regex", [])
-        items = dyn["items"]
+            async with self.renderer.render(render_data) as img_path:
+                if img_path:
+                    await self._send(
+                        sub_user,
+                        MessageChain().file_image(img_path).message(render_data["url"]),
+                    )
+                else:
+                    text = "\n".join(
+                        filter(None, render_data.get("text", "").split("\n"))
+                    )
+                    await self._send(
+                        sub_user,
+                        MessageChain()
+                        .message("渲染图片失败了 (´;ω;`)")
+                        .message(text)
+                        .url_image(cover_url),
+                    )
 
-        for item in items:
+    def _latest_item(self, dyn: Dict) -> Optional[Dict]:
+        """返回最新一条非置顶动态。"""
+        for item in dyn.get("items", []):
             if "modules" not in item:
                 continue
             # 过滤置顶
@@ -202,99 +600,105 @@ class DynamicListener:
                 and item["modules"]["module_tag"]["text"] == "置顶"
             ):
                 continue
-            # 无新动态
-            if item["id_str"] == last:
-                return None, None
-
-            dyn_id = item["id_str"]
-            # 转发类型
-            if item.get("type") == "DYNAMIC_TYPE_FORWARD":
-                if "forward" in filter_types:
-                    logger.info(f"转发类型在过滤列表 {filter_types} 中。")
-                    return None, dyn_id  # 返回 None 表示不推送，但更新 dyn_id
-                try:
-                    content_text = item["modules"]["module_dynamic"]["desc"]["text"]
-                except (TypeError, KeyError):
-                    content_text = None
-                if content_text and filter_regex:
-                    for regex_pattern in filter_regex:
-                        try:
-                            if re.search(regex_pattern, content_text):
-                                logger.info(f"转发内容匹配正则 {regex_pattern}。")
-                                return None, dyn_id
-                        except re.error as e:
-                            continue
-                render_data = await self.renderer.build_render_data(item)
-                render_data["url"] = f"https://t.bilibili.com/{dyn_id}"
-                render_data["qrcode"] = await create_qrcode(render_data["url"])
-
-                render_forward = await self.renderer.build_render_data(
-                    item["orig"], is_forward=True
-                )
-                if render_forward["image_urls"]:  # 检查列表是否非空
-                    render_forward["image_urls"] = [
-                        render_forward["image_urls"][0]
-                    ]  # 保留第一项
-                render_data["forward"] = render_forward
-                return render_data, dyn_id
-            elif item.get("type") in ("DYNAMIC_TYPE_DRAW", "DYNAMIC_TYPE_WORD"):
-                # 图文类型过滤
-                if "draw" in filter_types:
-                    logger.info(f"图文类型在过滤列表 {filter_types} 中。")
-                    return None, dyn_id
-
-                major = (
-                    item.get("modules", {}).get("module_dynamic", {}).get("major", {})
-                )
-                if major.get("type") == "MAJOR_TYPE_BLOCKED":
-                    logger.info(f"图文动态 {dyn_id} 为充电专属。")
-                    return None, dyn_id
-                opus = major["opus"]
-                summary_text = opus["summary"]["text"]
-
-                if (
-                    opus["summary"]["rich_text_nodes"][0].get("text") == "互动抽奖"
-                    and "lottery" in filter_types
-                ):
-                    logger.info(f"互动抽奖在过滤列表 {filter_types} 中。")
-                    return None, dyn_id
-                if filter_regex:  # 检查列表是否存在且不为空
-                    for regex_pattern in filter_regex:
-                        try:
-                            if re.search(regex_pattern, summary_text):
-                                logger.info(
-                                    f"图文动态 {dyn_id} 的 summary 匹配正则 '{regex_pattern}'。"
-                                )
-                                return None, dyn_id  # 匹配到任意一个正则就返回
-                        except re.error as e:
-                            continue  # 如果正则表达式本身有误，跳过这个正则继续检查下一个
-                render_data = await self.renderer.build_render_data(item)
-                return render_data, dyn_id
-            elif item.get("type") == "DYNAMIC_TYPE_AV":
-                # 视频类型过滤
-                if "video" in filter_types:
-                    logger.info(f"视频类型在过滤列表 {filter_types} 中。")
-                    return None, dyn_id
-                render_data = await self.renderer.build_render_data(item)
-                return render_data, dyn_id
-            elif item.get("type") == "DYNAMIC_TYPE_ARTICLE":
-                # 文章类型过滤
-                if "article" in filter_types:
-                    logger.info(f"文章类型在过滤列表 {filter_types} 中。")
-                    return None, dyn_id
-                is_blocked = (
-                    item["modules"]["module_dynamic"]["major"]["type"]
-                    == "MAJOR_TYPE_BLOCKED"
-                )
-                major = (
-                    item.get("modules", {}).get("module_dynamic", {}).get("major", {})
-                )
-                if major.get("type") == "MAJOR_TYPE_BLOCKED":
-                    logger.info(f"文章 {dyn_id} 为充电专属。")
-                    return None, dyn_id
-                render_data = await self.renderer.build_render_data(item)
-                return render_data, dyn_id
+            return item
+        return None
+
+    def _describe_item(self, item: Dict) -> Optional[Dict[str, Any]]:
+        """
+        提取过滤所需的动态特征，每条动态只需计算一次。
+        返回 None 表示不支持推送的动态类型。
+        """
+        dyn_type = item.get("type")
+        major = item.get("modules", {}).get("module_dynamic", {}).get("major") or {}
+        blocked = major.get("type") == "MAJOR_TYPE_BLOCKED"
+        info = {
+            "id": item["id_str"],
+            "category": None,
+            "blocked": False,
+            "lottery": False,
+            "text": None,
+            "mask": 0,
+        }
+        if dyn_type == "DYNAMIC_TYPE_FORWARD":
+            info["category"] = "forward"
+            try:
+                info["text"] = item["modules"]["module_dynamic"]["desc"]["text"]
+            except (TypeError, KeyError):
+                info["text"] = None
+        elif dyn_type in ("DYNAMIC_TYPE_DRAW", "DYNAMIC_TYPE_WORD"):
+            info["category"] = "draw"
+            info["blocked"] = blocked
+            if not blocked:
+                summary = major["opus"]["summary"]
+                nodes = summary.get("rich_text_nodes") or [{}]
+                info["text"] = summary["text"]
+                info["lottery"] = nodes[0].get("text") == "互动抽奖"
+        elif dyn_type == "DYNAMIC_TYPE_AV":
+            info["category"] = "video"
+        elif dyn_type == "DYNAMIC_TYPE_ARTICLE":
+            info["category"] = "article"
+            info["blocked"] = blocked
+        else:
+            return None
+        info["mask"] = FILTER_BITS[info["category"]]
+        if info["lottery"]:
+            info["mask"] |= FILTER_BITS["lottery"]
+        return info
+
+    def _is_filtered(self, info: Dict[str, Any], flt: CompiledFilter) -> bool:
+        """根据订阅者预编译的过滤条件判断动态是否应被过滤。"""
+        dyn_id = info["id"]
+        if flt.blocks(info["mask"]):
+            if flt.blocks(FILTER_BITS[info["category"]]):
+                logger.info(f"动态 {dyn_id} 的类型 {info['category']} 在过滤列表中。")
             else:
-                return None, None
+                logger.info(f"动态 {dyn_id} 为互动抽奖，在过滤列表中。")
+            return True
+        if info["blocked"]:
+            logger.info(f"动态 {dyn_id} 为充电专属。")
+            return True
+        pattern = flt.search(info["text"])
+        if pattern is not None:
+            logger.info(f"动态 {dyn_id} 的内容匹配正则 '{pattern}'。")
+            return True
+        return False
+
+    async def _build_dynamic_render_data(self, item: Dict) -> Dict[str, Any]:
+        """构建动态的渲染数据，转发动态会附带被转发的内容。"""
+        render_data = await self.renderer.build_render_data(item)
+        if item.get("type") != "DYNAMIC_TYPE_FORWARD":
+            return render_data
+
+        dyn_id = item["id_str"]
+        render_data["url"] = f"https://t.bilibili.com/{dyn_id}"
+        render_data["qrcode"] = await create_qrcode(render_data["url"])
+        render_forward = await self.renderer.build_render_data(
+            item["orig"], is_forward=True
+        )
+        if render_forward["image_urls"]:  # 检查列表是否非空
+            render_forward["image_urls"] = [
+                render_forward["image_urls"][0]
+            ]  # 保留第一项
+        render_data["forward"] = render_forward
+        return render_data
+
+    async def _parse_and_filter_dynamics(
+        self, dyn: Dict, data: Dict
+    ) -> Tuple[Any, Any]:
+        """
+        解析并过滤动态。
+        """
+        item = self._latest_item(dyn)
+        # 无新动态
+        if item is None or item["id_str"] == data["last"]:
+            return None, None
+
+        info = self._describe_item(item)
+        if info is None:
+            return None, None
 
-        return None, None
+        dyn_id = info["id"]
+        if self._is_filtered(info, CompiledFilter.from_sub(data)):
+            return None, dyn_id  # 返回 None 表示不推送，但更新 dyn_id
+        render_data = await self._build_dynamic_render_data(item)
+        return render_data, dyn_id
@@ -1,8 +1,8 @@
 from ast import alias
-import re
 import json
+import time
 import asyncio
-from typing import List
+from typing import Dict, List
 
 from astrbot.core.star.filter.command import GreedyStr
 from astrbot.api.all import *
@@ -20,13 +20,21 @@ from astrbot.api.event.filter import (
 )
 from bilibili_api import bangumi
 from bilibili_api.bangumi import IndexFilter as IF
-from aiohttp import ClientSession  # 若已存在请忽略
 from .utils import *
 from .renderer import Renderer
 from .bili_client import BiliClient
 from .listener import DynamicListener
 from .data_manager import DataManager
-from .constant import category_mapping, VALID_FILTER_TYPES, BV, LOGO_PATH
+from .filters import find_invalid_pattern
+from .constant import (
+    category_mapping,
+    VALID_FILTER_TYPES,
+    BV,
+    TEMP_DIR,
+    TEMP_SWEEP_INTERVAL,
+)
+from .cache import TempJanitor
+from .metrics import MetricsExporter, metrics
 
 
 @register("astrbot_plugin_bilibili", "Soulter", "", "", "")
@@ -41,10 +49,43 @@ class Main(Star):
         self.node = self.cfg.get("node", False)
         self.enable_parse_miniapp = self.cfg.get("enable_parse_miniapp", True)
         self.t2i_url = self.cfg.get("bili_t2i", "")
+        self.poll_concurrency = int(self.cfg.get("poll_concurrency", 4))
+        self.hot_interval_mins = float(self.cfg.get("hot_interval_mins", 2))
+        self.cold_interval_mins = float(self.cfg.get("cold_interval_mins", 30))
 
+        configure_image_executor(
+            self.cfg.get("image_executor", "thread"),
+            int(self.cfg.get("image_workers", 2)),
+        )
         self.data_manager = DataManager()
-        self.renderer = Renderer(self, self.rai, self.t2i_url)
-        self.bili_client = BiliClient(self.cfg.get("sessdata"))
+        self.data_manager.start_autoflush()
+        self.temp_janitor = TempJanitor(
+            TEMP_DIR,
+            max_age=float(self.cfg.get("temp_max_age_hours", 12)) * 3600,
+            max_bytes=int(float(self.cfg.get("temp_max_mb", 500)) * 1024 * 1024),
+            interval=TEMP_SWEEP_INTERVAL,
+        )
+        self.temp_janitor.start()
+        self.bili_client = BiliClient(
+            self.cfg.get("sessdata"),
+            rate_limits=self.cfg.get("rate_limits"),
+            link_store=(
+                self.data_manager if self.cfg.get("b23_disk_cache", True) else None
+            ),
+        )
+        self.renderer = Renderer(
+            self,
+            self.rai,
+            self.t2i_url,
+            cache_mb=float(self.cfg.get("render_cache_mb", 100)),
+            workers=int(self.cfg.get("render_workers", 2)),
+            http=self.bili_client.http,
+            backend=self.cfg.get("render_backend", "auto"),
+            font_path=self.cfg.get("native_font", ""),
+            asset_cache_mb=float(self.cfg.get("asset_cache_mb", 200)),
+            image_mode=self.cfg.get("image_preprocess", "downscale"),
+            output_format=self.cfg.get("output_format"),
+        )
         self.dynamic_listener = DynamicListener(
             context=self.context,
             data_manager=self.data_manager,
@@ -53,19 +94,25 @@ class Main(Star):
             interval_mins=self.interval_mins,
             rai=self.rai,
             node=self.node,
+            concurrency=self.poll_concurrency,
+            hot_interval_mins=self.hot_interval_mins,
+            cold_interval_mins=self.cold_interval_mins,
         )
 
         self.dynamic_listener_task = asyncio.create_task(self.dynamic_listener.start())
+        metrics.add_collector("plugin", self._collect_metrics)
+        self.metrics_exporter = MetricsExporter(
+            metrics,
+            textfile=self.cfg.get("metrics_textfile", ""),
+            port=int(self.cfg.get("metrics_port", 0)),
+        )
+        self.metrics_exporter.start()
 
     @regex(BV)
     async def get_video_info(self, event: AstrMessageEvent):
-        if len(event.message_str) == 12:
-            bvid = event.message_str
-        else:
-            match_ = re.search(BV, event.message_str, re.IGNORECASE)
-            if not match_:
-                return
-            bvid = "BV" + match_.group(1)[2:]
+        bvid = extract_bvid(event.message_str)
+        if not bvid:
+            return
 
         video_data = await self.bili_client.get_video_info(bvid=bvid)
         if not video_data:
@@ -75,7 +122,7 @@ class Main(Star):
 
         render_data = await create_render_data()
         render_data["name"] = "直面泰山Bot"
-        render_data["avatar"] = await image_to_base64(LOGO_PATH)
+        render_data["avatar"] = await logo_data_uri()
         render_data["title"] = info["title"]
         render_data["text"] = (
             f"UP 主: {info['owner']['name']}<br>"
@@ -86,15 +133,17 @@ class Main(Star):
         )
         render_data["image_urls"] = [info["pic"]]
 
-        img_path = await self.renderer.render_dynamic(render_data)
-        if img_path:
-            await event.send(MessageChain().file_image(img_path))
-        else:
-            msg = "渲染图片失败了 (´;ω;`)"
-            text = "\n".join(filter(None, render_data.get("text", "").split("<br>")))
-            await event.send(
-                MessageChain().message(msg).message(text).url_image(info["pic"])
-            )
+        async with self.renderer.render(render_data) as img_path:
+            if img_path:
+                await event.send(MessageChain().file_image(img_path))
+            else:
+                msg = "渲染图片失败了 (´;ω;`)"
+                text = "\n".join(
+                    filter(None, render_data.get("text", "").split("<br>"))
+                )
+                await event.send(
+                    MessageChain().message(msg).message(text).url_image(info["pic"])
+                )
 
     @command("订阅动态", alias={"bili_sub"})
     async def dynamic_sub(self, event: AstrMessageEvent, uid: str, input: GreedyStr):
@@ -111,6 +160,9 @@ class Main(Star):
         sub_user = event.unified_msg_origin
         if not uid.isdigit():
             return MessageEventResult().message("UID 格式错误")
+        err = find_invalid_pattern(filter_regex)
+        if err:
+            return MessageEventResult().message(f"过滤正则无效: {err}")
 
         # 检查是否已经存在该订阅
         if await self.data_manager.update_subscription(
@@ -120,7 +172,7 @@ class Main(Star):
             return MessageEventResult().message("该动态已订阅，已更新过滤条件。")
         # 以下为新增订阅
 
-        usr_info, msg = await self.bili_client.get_user_info(int(uid))
+        usr_info, msg = await self.bili_client.get_profile(int(uid), full=True)
         if not usr_info:
             return MessageEventResult().message(msg)
 
@@ -158,7 +210,7 @@ class Main(Star):
 
         render_data = await create_render_data()
         render_data["name"] = "直面泰山Bot"
-        render_data["avatar"] = await image_to_base64(LOGO_PATH)
+        render_data["avatar"] = await logo_data_uri()
         render_data["text"] = (
             f"📣 订阅成功！<br>"
             f"UP 主: {name} | 性别: {sex}"
@@ -168,19 +220,19 @@ class Main(Star):
         render_data["url"] = f"https://space.bilibili.com/{mid}"
         render_data["qrcode"] = await create_qrcode(render_data["url"])
         if self.rai:
-            img_path = await self.renderer.render_dynamic(render_data)
-            if img_path:
-                await event.send(
-                    MessageChain().file_image(img_path).message(render_data["url"])
-                )
-            else:
-                msg = "渲染图片失败了 (´;ω;`)"
-                text = "\n".join(
-                    filter(None, render_data.get("text", "").split("<br>"))
-                )
-                await event.send(
-                    MessageChain().message(msg).message(text).url_image(avatar)
-                )
+            async with self.renderer.render(render_data) as img_path:
+                if img_path:
+                    await event.send(
+                        MessageChain().file_image(img_path).message(render_data["url"])
+                    )
+                else:
+                    msg = "渲染图片失败了 (´;ω;`)"
+                    text = "\n".join(
+                        filter(None, render_data.get("text", "").split("<br>"))
+                    )
+                    await event.send(
+                        MessageChain().message(msg).message(text).url_image(avatar)
+                    )
         else:
             chain = [
                 Plain(render_data["text"]),
@@ -198,9 +250,10 @@ class Main(Star):
         if not subs:
             return MessageEventResult().message("无订阅")
         else:
+            profiles = await self.bili_client.get_profiles([sub["uid"] for sub in subs])
             for idx, uid_sub_data in enumerate(subs):
                 uid = uid_sub_data["uid"]
-                info, _ = await self.bili_client.get_user_info(int(uid))
+                info = profiles.get(int(uid))
                 if not info:
                     ret += f"{idx + 1}. {uid} - 无法获取 UP 主信息\n"
                 else:
@@ -301,13 +354,16 @@ class Main(Star):
                 filter_types.append(arg)
             else:
                 filter_regex.append(arg)
+        err = find_invalid_pattern(filter_regex)
+        if err:
+            return MessageEventResult().message(f"过滤正则无效: {err}")
 
         if await self.data_manager.update_subscription(
             sid, int(uid), filter_types, filter_regex
         ):
             return MessageEventResult().message("该动态已订阅，已更新过滤条件")
 
-        usr_info, msg = await self.bili_client.get_user_info(int(uid))
+        usr_info, msg = await self.bili_client.get_profile(int(uid))
         if not usr_info:
             return MessageEventResult().message(msg)
         try:
@@ -345,6 +401,132 @@ class Main(Star):
                 ret += f"  - {uid}\n"
         return MessageEventResult().message(ret)
 
+    @permission_type(PermissionType.ADMIN)
+    @command("轮询档位", alias={"bili_poll_tiers"})
+    async def poll_tiers(self, event: AstrMessageEvent, uid: str = None):
+        """管理员指令。查看 UP 主的轮询档位（hot/warm/cold）与下次检查时间。"""
+        if uid is not None and not str(uid).isdigit():
+            return MessageEventResult().message("UID 格式错误")
+        rows = self.dynamic_listener.describe_tiers(int(uid) if uid else None)
+        if not rows:
+            return MessageEventResult().message("没有找到相关订阅。")
+
+        counts = {tier: 0 for tier in ("hot", "warm", "cold")}
+        ret = ""
+        for row in rows:
+            counts[row["tier"]] += 1
+            next_due = row["next_due"]
+            next_desc = (
+                f"{max(0, next_due):.0f}s 后" if next_due is not None else "未调度"
+            )
+            last = row["last_active"]
+            last_desc = (
+                time.strftime("%m-%d %H:%M", time.localtime(last)) if last else "未知"
+            )
+            ret += (
+                f"- {row['uid']} [{row['tier']}] 间隔 {row['interval'] / 60:g} 分钟 | "
+                f"下次检查 {next_desc} | 最近活动 {last_desc} | 订阅会话 {row['subscribers']}\n"
+            )
+        summary = " / ".join(f"{tier}: {n}" for tier, n in counts.items())
+        return MessageEventResult().message(f"轮询档位 ({summary})：\n" + ret)
+
+    @permission_type(PermissionType.ADMIN)
+    @command("导出订阅", alias={"bili_export"})
+    async def export_subs(self, event: AstrMessageEvent):
+        """管理员指令。将所有订阅导出为 JSON 文件作为备份。"""
+        try:
+            path = await self.data_manager.export_json()
+        except Exception as e:
+            logger.error(f"导出订阅失败: {e}")
+            return MessageEventResult().message(f"导出订阅失败: {e}")
+        return MessageEventResult().message(f"已导出订阅到 {path}")
+
+    def _cache_stats(self) -> Dict[str, Dict[str, int]]:
+        caches = dict(image_cache_stats())
+        caches["profile"] = self.bili_client.profiles.stats()
+        caches["b23"] = self.bili_client.short_links.stats()
+        if self.renderer.cache:
+            caches["render"] = self.renderer.cache.stats()
+        if self.renderer.assets:
+            caches["asset"] = self.renderer.assets.cache.stats()
+        return caches
+
+    def _collect_metrics(self) -> Dict[str, Dict[tuple, float]]:
+        """导出指标时读取缓存、限流器与临时目录的当前统计。"""
+        gauges: Dict[str, Dict[tuple, float]] = {}
+
+        def put(name: str, value: float, **labels):
+            gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+        for name, stats in self._cache_stats().items():
+            for field in ("hits", "misses", "entries"):
+                put(f"cache_{field}", stats[field], cache=name)
+        for family, stats in self.bili_client.limiter_stats().items():
+            put("limiter_open", int(stats["open"]), endpoint=family)
+            put("limiter_rate_factor", stats["rate_factor"], endpoint=family)
+            put("limiter_throttled", stats["throttled"], endpoint=family)
+        for field, value in self.temp_janitor.stats().items():
+            put(f"temp_{field}", value)
+        return gauges
+
+    @permission_type(PermissionType.ADMIN)
+    @command("插件统计", alias={"bili_stats"})
+    async def plugin_stats(self, event: AstrMessageEvent):
+        """管理员指令。查看插件各缓存的命中率、临时目录与接口限流状态。"""
+        caches = self._cache_stats()
+
+        ret = "缓存统计：\n"
+        for name, stats in caches.items():
+            total = stats["hits"] + stats["misses"]
+            rate = f"{stats['hits'] / total:.1%}" if total else "-"
+            ret += (
+                f"- {name}: 命中率 {rate} ({stats['hits']}/{total})，"
+                f"条目 {stats['entries']}\n"
+            )
+
+        temp = self.temp_janitor.stats()
+        ret += (
+            f"临时目录：{temp['files']} 个文件，{temp['bytes'] / 1024 / 1024:.1f} MB，"
+            f"已清理过期 {temp['expired']} 个、超限 {temp['evictions']} 个，"
+            f"共释放 {temp['freed_bytes'] / 1024 / 1024:.1f} MB\n"
+        )
+
+        ret += "接口限流：\n"
+        for family, stats in self.bili_client.limiter_stats().items():
+            state = "熔断中" if stats["open"] else f"{stats['rate_factor']:.0%} 速率"
+            ret += (
+                f"- {family}: {state}，排队 {stats['throttled']} 次，"
+                f"风控 {stats['risk_events']} 次，拒绝 {stats['rejected']} 次\n"
+            )
+        return MessageEventResult().message(ret)
+
+    @permission_type(PermissionType.ADMIN)
+    @command("插件指标", alias={"bili_metrics"})
+    async def plugin_metrics(self, event: AstrMessageEvent):
+        """管理员指令。查看各阶段耗时、接口请求与错误计数、渲染重试与推送延迟。"""
+
+        def fmt_labels(labels) -> str:
+            return ",".join(v for _, v in labels)
+
+        ret = "阶段耗时 (次数 / p50 / p95 / 最大)：\n"
+        for name, series in sorted(metrics.histograms.items()):
+            for labels, hist in sorted(series.items()):
+                tag = f"{name}[{fmt_labels(labels)}]" if labels else name
+                ret += (
+                    f"- {tag}: {hist.count} / {hist.quantile(0.5):.2f}s / "
+                    f"{hist.quantile(0.95):.2f}s / {hist.max:.2f}s\n"
+                )
+        ret += "计数：\n"
+        for name, series in sorted(metrics.counters.items()):
+            parts = [
+                f"{fmt_labels(labels) or '总计'} {value:g}"
+                for labels, value in sorted(series.items())
+            ]
+            ret += f"- {name}: {'，'.join(parts)}\n"
+        if not metrics.histograms and not metrics.counters:
+            ret += "暂无数据\n"
+        return MessageEventResult().message(ret)
+
     @event_message_type(EventMessageType.ALL)
     async def parse_miniapp(self, event: AstrMessageEvent):
         if self.enable_parse_miniapp:
@@ -355,9 +537,15 @@ class Main(Star):
                     and hasattr(msg_element, "data")
                 ):
                     json_string = msg_element.data
+                    # 新版框架已将卡片解析为 dict，预筛对字符串与 dict 均只做廉价检查
+                    if not maybe_bili_miniapp(json_string):
+                        continue
 
                     try:
-                        parsed_data = json.loads(json_string)
+                        if isinstance(json_string, str):
+                            parsed_data = json.loads(json_string)
+                        else:
+                            parsed_data = json_string
                         meta = parsed_data.get("meta", {})
                         detail_1 = meta.get("detail_1", {})
                         title = detail_1.get("title")
@@ -411,10 +599,11 @@ class Main(Star):
         if cookie:
             headers["Cookie"] = cookie
         try:
-            async with ClientSession(headers=headers) as session:
-                async with session.get(url, params=params, timeout=10) as resp:
-                    resp.raise_for_status()
-                    raw = await resp.json(content_type=None)
+            async with self.bili_client.http.session.get(
+                url, params=params, headers=headers, timeout=10
+            ) as resp:
+                resp.raise_for_status()
+                raw = await resp.json(content_type=None)
         except Exception as e:
             await event.send(
                 MessageChain().message(f"获取直播间信息失败: {e}")
@@ -434,7 +623,7 @@ class Main(Star):
 
         render_data = await create_render_data()
         render_data["name"] = "直面泰山Bot"
-        render_data["avatar"] = await image_to_base64(LOGO_PATH)
+        render_data["avatar"] = await logo_data_uri()
         render_data["title"] = live_name
         render_data["url"] = link
         render_data["image_urls"] = [cover_url] if cover_url else []
@@ -446,26 +635,28 @@ class Main(Star):
 
         if render_data.get("text"):
             render_data["qrcode"] = await create_qrcode(link)
-            img_path = await self.renderer.render_dynamic(render_data)
-            if img_path:
-                if live_status == 1:
-                    await event.send(
-                        MessageChain()
-                        .file_image(img_path)
-                        .message("点击链接空降直播间:" + render_data["url"])
-                    )
+            async with self.renderer.render(render_data) as img_path:
+                if img_path:
+                    if live_status == 1:
+                        await event.send(
+                            MessageChain()
+                            .file_image(img_path)
+                            .message("点击链接空降直播间:" + render_data["url"])
+                        )
+                    else:
+                        await event.send(MessageChain().file_image(img_path))
                 else:
-                    await event.send(
-                        MessageChain().file_image(img_path)
+                    text = "\n".join(
+                        filter(None, render_data.get("text", "").split("\n"))
                     )
-            else:
-                text = "\n".join(filter(None, render_data.get("text", "").split("\n")))
-                chain = MessageChain().message(text)
-                if cover_url:
-                    chain = chain.url_image(cover_url)
-                if live_status == 1:
-                    chain = chain.message("点击链接空降直播间:" + render_data["url"])
-                await event.send(chain)
+                    chain = MessageChain().message(text)
+                    if cover_url:
+                        chain = chain.url_image(cover_url)
+                    if live_status == 1:
+                        chain = chain.message(
+                            "点击链接空降直播间:" + render_data["url"]
+                        )
+                    await event.send(chain)
 
     async def terminate(self):
         if self.dynamic_listener_task and not self.dynamic_listener_task.done():
@@ -480,3 +671,8 @@ class Main(Star):
                 logger.error(
                     f"Error awaiting cancellation of dynamic_listener task: {e}"
                 )
+        await self.temp_janitor.close()
+        await self.metrics_exporter.close()
+        await self.bili_client.close()
+        shutdown_image_executor()
+        await self.data_manager.close()
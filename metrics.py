@@ -0,0 +1,223 @@
+import os
+import time
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+from aiohttp import web
+from astrbot.api import logger
+
+# 耗时直方图的分桶上限（秒），覆盖从二维码生成到推送延迟的量级
+BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+RECENT_SAMPLES = 256  # 每个耗时指标保留的最近样本数，用于计算分位数
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """耗时分布：累计分桶计数（供 Prometheus 导出）与最近样本（供计算分位数）。"""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent: Deque[float] = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class Metrics:
+    """
+    插件内的计数器与耗时指标。
+    指标以名称加标签区分，如 api_requests_total{endpoint="dynamics"}；
+    缓存、限流器等已有统计通过 add_collector 注册，在导出时读取为 gauge。
+    """
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Dict[Labels, float]]]] = {}
+        self.started = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels: Any):
+        series = self.counters.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any):
+        series = self.histograms.setdefault(name, {})
+        key = _labels(labels)
+        if key not in series:
+            series[key] = Histogram()
+        series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """记录代码块的耗时（秒），异常退出时同样记录。"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def add_collector(
+        self, name: str, collect: Callable[[], Dict[str, Dict[Labels, float]]]
+    ):
+        """
+        注册一个在导出时调用的函数，返回 {指标名: {标签: 值}} 形式的 gauge。
+        同名的函数会被替换（插件重载时不会重复注册）。
+        """
+        self._collectors[name] = collect
+
+    def gauges(self) -> Dict[str, Dict[Labels, float]]:
+        result: Dict[str, Dict[Labels, float]] = {}
+        for collect in self._collectors.values():
+            try:
+                for name, series in collect().items():
+                    result.setdefault(name, {}).update(series)
+            except Exception as e:
+                logger.warning(f"读取插件指标失败: {e}")
+        return result
+
+    def render_prometheus(self, prefix: str = "astrbot_bilibili_") -> str:
+        """导出为 Prometheus 文本格式。"""
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}{name} counter")
+            for labels, value in series.items():
+                lines.append(f"{prefix}{name}{_format_labels(labels)} {value:g}")
+        for name, series in sorted(self.histograms.items()):
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            for labels, hist in series.items():
+                cumulative = 0
+                for bound, count in zip(BUCKETS, hist.buckets):
+                    cumulative += count
+                    le = _format_labels(labels, f'le="{bound:g}"')
+                    lines.append(f"{prefix}{name}_bucket{le} {cumulative}")
+                le = _format_labels(labels, 'le="+Inf"')
+                lines.append(f"{prefix}{name}_bucket{le} {hist.count}")
+                lines.append(f"{prefix}{name}_sum{_format_labels(labels)} {hist.sum:g}")
+                lines.append(
+                    f"{prefix}{name}_count{_format_labels(labels)} {hist.count}"
+                )
+        for name, series in sorted(self.gauges().items()):
+            lines.append(f"# TYPE {prefix}{name} gauge")
+            for labels, value in series.items():
+                lines.append(f"{prefix}{name}{_format_labels(labels)} {value:g}")
+        lines.append(f"# TYPE {prefix}uptime_seconds gauge")
+        lines.append(f"{prefix}uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+
+# 插件全局的指标，各模块直接记录到这里
+metrics = Metrics()
+
+
+def _write_text_atomic(path: str, text: str):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    """
+    将指标以 Prometheus 文本格式导出：定期写入文件（供 node_exporter 的 textfile collector 读取），
+    和/或在本机端口上提供 /metrics 接口。两者均为可选。
+    """
+
+    def __init__(
+        self,
+        registry: Metrics,
+        textfile: str = "",
+        port: int = 0,
+        interval: float = 15,
+        host: str = "127.0.0.1",
+    ):
+        self.registry = registry
+        self.textfile = textfile
+        self.port = port
+        self.interval = interval
+        self.host = host
+        self._task: Optional[asyncio.Task] = None
+        self._runner = None
+
+    def start(self):
+        """在后台启动导出任务，未配置文件与端口时不做任何事。"""
+        if (self.textfile or self.port) and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        if self.port:
+            await self._serve()
+        if not self.textfile:
+            return
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                text = self.registry.render_prometheus()
+                await loop.run_in_executor(
+                    None, _write_text_atomic, self.textfile, text
+                )
+            except Exception as e:
+                logger.error(f"写入指标文件失败: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _serve(self):
+        async def handle(request: web.Request) -> web.Response:
+            return web.Response(
+                text=self.registry.render_prometheus(),
+                content_type="text/plain",
+                charset="utf-8",
+            )
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+            logger.info(
+                f"bilibili 插件指标接口: http://{self.host}:{self.port}/metrics"
+            )
+        except OSError as e:
+            logger.error(f"启动指标接口失败 ({self.host}:{self.port}): {e}")
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def close(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
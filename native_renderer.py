@@ -0,0 +1,418 @@
+import io
+import os
+import re
+import html
+import base64
+import asyncio
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import aiohttp
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+from astrbot.api import logger
+from .utils import run_image_task, save_image
+
+# 与 template.html 的卡片布局保持一致（截图会被裁剪到 700px 宽）
+CARD_WIDTH = 700
+CARD_MARGIN = 10
+HEADER_HEIGHT = 106
+AVATAR_SIZE = 53
+QRCODE_SIZE = 96
+GRID_GAP = 10
+GALLERY_WIDTH = CARD_WIDTH - CARD_MARGIN * 2 - 24  # 图片区内宽，两侧各 12px 内边距
+MAX_TEXT_LINES = 30
+FORWARD_TEXT_LINES = 8
+# AstrBot 本地文转图使用的自定义字体位置
+ASTRBOT_FONT_PATH = os.path.join("data", "font.ttf")
+FONT_CANDIDATES = (
+    "msyh.ttc",
+    "NotoSansCJK-Regular.ttc",
+    "NotoSansSC-Regular.otf",
+    "wqy-microhei.ttc",
+    "wqy-zenhei.ttc",
+    "PingFang.ttc",
+    "Heiti.ttc",
+)
+
+BG_TOP = (239, 183, 228)
+BG_BOTTOM = (154, 185, 235)
+CARD_BG = (250, 251, 255)
+HEADER_BG = (255, 238, 242)
+TEXT_BG = (240, 244, 252)
+GALLERY_BG = (207, 233, 249)
+FORWARD_BG = (227, 223, 223)
+FOOTER_BG = (236, 236, 246)
+NAME_COLOR = (251, 114, 153)
+TAG_BG = (255, 224, 230)
+TAG_COLOR = (126, 87, 194)
+TEXT_COLOR = (44, 62, 80)
+FOOTER_COLOR = (30, 136, 229)
+
+
+def find_font(preferred: str = "") -> Optional[str]:
+    """按 配置 -> AstrBot 自定义字体 -> 系统常见中文字体 的顺序查找可用且支持中文的字体。"""
+    for spec in (preferred, ASTRBOT_FONT_PATH, *FONT_CANDIDATES):
+        if not spec:
+            continue
+        try:
+            font = ImageFont.truetype(spec, 16)
+        except OSError:
+            continue
+        if _supports_cjk(font):
+            return spec
+    return None
+
+
+def _glyph(font: ImageFont.FreeTypeFont, ch: str) -> bytes:
+    image = Image.new("L", (32, 32))
+    ImageDraw.Draw(image).text((0, 0), ch, 255, font)
+    return image.tobytes()
+
+
+def _supports_cjk(font: ImageFont.FreeTypeFont) -> bool:
+    # 缺字时会绘制与私用区字符相同的占位框
+    return _glyph(font, "中") != _glyph(font, "\U0010fffd")
+
+
+def is_simple_card(render_data: Dict[str, Any]) -> bool:
+    """无转发、最多一张图、正文不含表情图片的卡片，原生绘制与 HTML 效果一致。"""
+    return (
+        not render_data.get("forward")
+        and len(render_data.get("image_urls") or []) <= 1
+        and "<img" not in (render_data.get("text") or "")
+    )
+
+
+def html_to_plain(text: str) -> str:
+    """将富文本中的换行与链接转为纯文本，表情图片等其它标签直接去除。"""
+    text = re.sub(r"<br\s*/?>", "\n", text or "", flags=re.IGNORECASE)
+    text = re.sub(r"<[^>]+>", "", text)
+    return html.unescape(text)
+
+
+def _read_local(path: str) -> Optional[bytes]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def fetch_image_bytes(
+    src: str, session: Optional[aiohttp.ClientSession]
+) -> Optional[bytes]:
+    """读取 http(s) 链接、data URI 或本地路径指向的图片内容，失败时返回 None。"""
+    if not src:
+        return None
+    try:
+        if src.startswith("data:"):
+            return base64.b64decode(src.split(",", 1)[1])
+        if src.startswith(("http://", "https://")):
+            if session is None:
+                return None
+            async with session.get(src, timeout=10) as resp:
+                if resp.status != 200:
+                    return None
+                return await resp.read()
+        return await run_image_task(_read_local, src)
+    except Exception as e:
+        logger.warning(f"读取卡片图片失败 ({src[:80]}): {e}")
+    return None
+
+
+@lru_cache(maxsize=16)
+def _font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(path, size)
+
+
+def _open(
+    blob: Optional[bytes], box: Optional[Tuple[int, int]] = None
+) -> Optional[Image.Image]:
+    """
+    解码图片。传入 box 时按照片处理：JPEG 直接以接近目标的尺寸解码，
+    并转换为 RGB；否则（头像、挂件、二维码）保留透明通道。
+    """
+    if not blob:
+        return None
+    try:
+        image = Image.open(io.BytesIO(blob))
+        if box is None:
+            return image.convert("RGBA")
+        image.draft("RGB", box)
+        return image.convert("RGB")
+    except Exception:
+        return None
+
+
+def _wrap(text: str, font: ImageFont.FreeTypeFont, width: int, max_lines: int):
+    lines: List[str] = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for ch in paragraph:
+            if font.getlength(line + ch) > width:
+                lines.append(line)
+                line = ch
+            else:
+                line += ch
+        lines.append(line)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = lines[-1][:-1] + "…"
+    return lines
+
+
+def _fit(image: Image.Image, box: Tuple[int, int]) -> Image.Image:
+    """等比缩放到 box 内（object-fit: contain），会修改传入的图片。"""
+    image.thumbnail(box, Image.BICUBIC, reducing_gap=2.0)
+    return image
+
+
+def _round_mask(size: Tuple[int, int], radius: int) -> Image.Image:
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).rounded_rectangle((0, 0, *size), radius, fill=255)
+    return mask
+
+
+def _paste_rounded(canvas: Image.Image, image: Image.Image, xy, radius: int = 12):
+    mask = _round_mask(image.size, radius)
+    if image.mode == "RGBA":
+        mask = Image.composite(image.getchannel("A"), mask, mask)
+    canvas.paste(image, xy, mask)
+
+
+def _circle(image: Image.Image, size: int) -> Image.Image:
+    image.thumbnail((size * 4, size * 4), Image.LANCZOS, reducing_gap=2.0)
+    image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+    mask = Image.new("L", (size, size), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, size, size), fill=255)
+    image.putalpha(mask)
+    return image
+
+
+def gallery_layout(count: int, width: int) -> Tuple[int, int]:
+    """返回 (列数, 单元格边长)，与模板中 count-N 的网格设置一致。"""
+    cols = 2 if count in (2, 4) else 3
+    return cols, (width - GRID_GAP * (cols - 1)) // cols
+
+
+def _render_card_sync(
+    render_data: Dict[str, Any],
+    images: Dict[str, Optional[bytes]],
+    output_path: str,
+    font_path: str,
+    fmt: str = "png",
+    quality: int = 85,
+) -> bool:
+    """在工作线程/进程中绘制卡片并按 fmt 格式保存。"""
+    inner = CARD_WIDTH - CARD_MARGIN * 2
+    name_font = _font(font_path, 22)
+    tag_font = _font(font_path, 14)
+    text_font = _font(font_path, 17)
+    small_font = _font(font_path, 15)
+    line_h = int(text_font.size * 1.6)
+
+    text = html_to_plain(render_data.get("text") or "动态内容为空")
+    text_lines = _wrap(text, text_font, inner - 40, MAX_TEXT_LINES)
+    text_h = len(text_lines) * line_h + 20
+
+    forward = render_data.get("forward") or {}
+    body: List[Tuple[str, Any]] = []  # 依次绘制的区块
+    body_h = 0
+    if forward.get("name"):
+        f_lines = _wrap(
+            html_to_plain(forward.get("text") or ""),
+            small_font,
+            inner - 60,
+            FORWARD_TEXT_LINES,
+        )
+        f_box = (inner - 40, 480)
+        f_image = _open(images.get((forward.get("image_urls") or [""])[0]), f_box)
+        if f_image is not None:
+            f_image = _fit(f_image, f_box)
+        h = 56 + len(f_lines) * int(small_font.size * 1.6) + 20
+        if forward.get("title"):
+            h += 34
+        if f_image is not None:
+            h += f_image.height + 15
+        body.append(("forward", (f_lines, f_image, h)))
+        body_h += h + 8
+    else:
+        urls = render_data.get("image_urls") or []
+        cols, cell = gallery_layout(len(urls), GALLERY_WIDTH)
+        box = (inner - 40, 900) if len(urls) == 1 else (cell, cell)
+        pics = [_open(images.get(u), box) for u in urls]
+        pics = [p for p in pics if p is not None]
+        if len(pics) == 1:
+            pic = _fit(pics[0], box)
+            body.append(("single", pic))
+            body_h += pic.height + 40 + 8
+        elif pics:
+            cols, cell = gallery_layout(len(pics), GALLERY_WIDTH)
+            rows = (len(pics) + cols - 1) // cols
+            h = rows * cell + (rows - 1) * GRID_GAP + 18
+            body.append(("grid", (pics, cols, cell, h)))
+            body_h += h + 8
+
+    height = CARD_MARGIN + HEADER_HEIGHT + text_h + 8 + body_h + 60 + CARD_MARGIN
+    # 先生成单列渐变再横向拉伸，避免对整张画布做插值缩放
+    bg = (
+        Image.linear_gradient("L")
+        .resize((1, height))
+        .resize((CARD_WIDTH, height), Image.NEAREST)
+    )
+    canvas = Image.composite(
+        Image.new("RGB", (CARD_WIDTH, height), BG_BOTTOM),
+        Image.new("RGB", (CARD_WIDTH, height), BG_TOP),
+        bg,
+    )
+    draw = ImageDraw.Draw(canvas)
+    left, top = CARD_MARGIN, CARD_MARGIN
+    draw.rounded_rectangle(
+        (left, top, left + inner, height - CARD_MARGIN), 18, fill=CARD_BG
+    )
+
+    # 头部：头像、头像框、名称、标签与二维码
+    draw.rounded_rectangle(
+        (left, top, left + inner, top + HEADER_HEIGHT), 18, fill=HEADER_BG
+    )
+    x = left + 24
+    avatar = _open(images.get(render_data.get("avatar") or ""))
+    if avatar is not None:
+        ay = top + (HEADER_HEIGHT - AVATAR_SIZE) // 2
+        avatar = _circle(avatar, AVATAR_SIZE)
+        canvas.paste(avatar, (x + 20, ay), avatar)
+        pendant = _open(images.get(render_data.get("pendant") or ""))
+        if pendant is not None:
+            pendant = pendant.resize((90, 90), Image.LANCZOS, reducing_gap=2.0)
+            canvas.paste(pendant, (x + 1, top + 8), pendant)
+        x += 96 + 16
+    qr = _open(images.get(render_data.get("qrcode") or ""))
+    right = left + inner - 24
+    if qr is not None:
+        qr = qr.resize((QRCODE_SIZE, QRCODE_SIZE), Image.NEAREST)
+        canvas.paste(qr, (right - QRCODE_SIZE, top + 5), qr)
+        right -= QRCODE_SIZE + 8
+    y = top + 14
+    draw.text((x, y), render_data.get("name") or "直面泰山Bot", NAME_COLOR, name_font)
+    y += 32
+    for tag in ("订阅更新", render_data.get("title")):
+        if not tag:
+            continue
+        tag = _wrap(tag, tag_font, right - x - 20, 1)[0]
+        w = int(tag_font.getlength(tag)) + 20
+        draw.rounded_rectangle((x, y, x + w, y + 24), 6, fill=TAG_BG)
+        draw.text((x + 10, y + 4), tag, TAG_COLOR, tag_font)
+        y += 28
+
+    # 正文
+    y = top + HEADER_HEIGHT + 4
+    draw.rounded_rectangle(
+        (left + 8, y, left + inner - 8, y + text_h), 18, fill=TEXT_BG
+    )
+    ty = y + 10
+    for line in text_lines:
+        draw.text((left + 20, ty), line, TEXT_COLOR, text_font)
+        ty += line_h
+    y += text_h + 8
+
+    # 图片区 / 转发内容
+    for kind, data in body:
+        if kind == "single":
+            draw.rounded_rectangle(
+                (left, y, left + inner, y + data.height + 40), 18, fill=GALLERY_BG
+            )
+            _paste_rounded(canvas, data, (left + (inner - data.width) // 2, y + 20))
+            y += data.height + 48
+        elif kind == "grid":
+            pics, cols, cell, h = data
+            draw.rounded_rectangle((left, y, left + inner, y + h), 18, fill=GALLERY_BG)
+            for i, pic in enumerate(pics):
+                pic = _fit(pic, (cell, cell))
+                cx = left + 12 + (i % cols) * (cell + GRID_GAP)
+                cy = y + 8 + (i // cols) * (cell + GRID_GAP)
+                _paste_rounded(
+                    canvas,
+                    pic,
+                    (cx + (cell - pic.width) // 2, cy + (cell - pic.height) // 2),
+                )
+            y += h + 8
+        else:
+            f_lines, f_image, h = data
+            draw.rounded_rectangle((left, y, left + inner, y + h), 18, fill=FORWARD_BG)
+            fx, fy = left + 20, y + 10
+            f_avatar = _open(images.get(forward.get("avatar") or ""))
+            if f_avatar is not None:
+                f_avatar = _circle(f_avatar, 38)
+                canvas.paste(f_avatar, (fx + 12, fy + 2), f_avatar)
+                fx += 52
+            draw.text((fx, fy + 10), forward["name"], (68, 68, 68), small_font)
+            fy += 50
+            if forward.get("title"):
+                draw.text((left + 24, fy), forward["title"], (51, 51, 51), name_font)
+                fy += 34
+            for line in f_lines:
+                draw.text((left + 26, fy), line, (11, 11, 11), small_font)
+                fy += int(small_font.size * 1.6)
+            if f_image is not None:
+                _paste_rounded(
+                    canvas, f_image, (left + (inner - f_image.width) // 2, fy + 10), 8
+                )
+            y += h + 8
+
+    # 页脚
+    footer = "由直面泰山Bot创建"
+    fy = height - CARD_MARGIN - 56
+    draw.rounded_rectangle(
+        (left, fy, left + inner, height - CARD_MARGIN), 18, fill=FOOTER_BG
+    )
+    fw = int(small_font.getlength(footer))
+    draw.text((left + inner - 36 - fw, fy + 18), footer, FOOTER_COLOR, small_font)
+
+    save_image(canvas, output_path, fmt, quality)
+    return True
+
+
+class NativeCardRenderer:
+    """
+    使用 Pillow 直接绘制与 template.html 布局一致的卡片，无需浏览器或 t2i 服务。
+    只支持纯文本正文（富文本中的表情图片会被省略）。
+    """
+
+    def __init__(self, font_path: str = ""):
+        self.font_path = find_font(font_path)
+        if self.font_path is None:
+            logger.warning(
+                "未找到支持中文的字体，原生卡片渲染不可用，将使用 HTML 渲染。"
+            )
+
+    @property
+    def available(self) -> bool:
+        return self.font_path is not None
+
+    async def render(
+        self,
+        render_data: Dict[str, Any],
+        output_path: str,
+        session: Optional[aiohttp.ClientSession] = None,
+        fmt: str = "png",
+        quality: int = 85,
+    ) -> bool:
+        """下载卡片所需的图片后在图片执行器中绘制，成功时返回 True。"""
+        forward = render_data.get("forward") or {}
+        sources = {
+            render_data.get("avatar"),
+            render_data.get("pendant"),
+            render_data.get("qrcode"),
+            forward.get("avatar"),
+            *(render_data.get("image_urls") or []),
+            *(forward.get("image_urls") or [])[:1],
+        }
+        sources = [s for s in sources if s]
+        blobs = await asyncio.gather(*(fetch_image_bytes(s, session) for s in sources))
+        return await run_image_task(
+            _render_card_sync,
+            render_data,
+            dict(zip(sources, blobs)),
+            output_path,
+            self.font_path,
+            fmt,
+            quality,
+        )
@@ -0,0 +1,145 @@
+import time
+import random
+import asyncio
+from typing import Any, Dict, Optional
+from astrbot.api import logger
+
+# B站风控相关的返回码 / HTTP 状态码
+RISK_CONTROL_CODES = {-412, -352, 412}
+
+
+class CircuitOpenError(Exception):
+    """接口族处于熔断状态，请求被直接拒绝。"""
+
+
+def risk_control_code(exc: BaseException) -> Optional[int]:
+    """若异常由风控引起，返回对应的错误码，否则返回 None。"""
+    code = getattr(exc, "code", None)
+    if code is None:
+        code = getattr(exc, "status", None)  # NetworkException / aiohttp 的 HTTP 状态码
+    return code if code in RISK_CONTROL_CODES else None
+
+
+def error_code(exc: BaseException) -> str:
+    """用于统计的错误码：接口返回码或 HTTP 状态码，没有时为异常类型名。"""
+    if isinstance(exc, CircuitOpenError):
+        return "circuit_open"
+    code = getattr(exc, "code", None)
+    if code is None:
+        code = getattr(exc, "status", None)
+    return str(code) if isinstance(code, int) else type(exc).__name__
+
+
+class EndpointLimiter:
+    """
+    单个接口族的客户端限流器。
+
+    - 令牌桶：平均速率 rate_per_min，允许 burst 次突发。
+    - 退避：遇到风控码后按指数退避并加入抖动，退避期间的请求排队等待。
+    - 熔断：连续 breaker_threshold 次风控后暂停该接口族 cooldown 秒，期间请求直接失败；
+      恢复后从 1/4 速率开始，每次成功翻倍，直到恢复全速。
+    """
+
+    RECOVERY_START = 0.25
+
+    def __init__(
+        self,
+        name: str,
+        rate_per_min: float,
+        burst: int = 5,
+        backoff_base: float = 5,
+        backoff_max: float = 300,
+        breaker_threshold: int = 3,
+        cooldown: float = 600,
+    ):
+        self.name = name
+        self.rate = max(rate_per_min, 0.1) / 60
+        self.burst = max(int(burst), 1)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = max(int(breaker_threshold), 1)
+        self.cooldown = cooldown
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._failures = 0  # 连续风控次数
+        self._trips = 0  # 恢复全速前连续熔断的次数，用于延长冷却时间
+        self._factor = 1.0  # 当前速率系数，熔断恢复期间小于 1
+        self._paused_until = 0.0
+        self._open_until = 0.0
+        self.throttled = 0
+        self.risk_events = 0
+        self.rejected = 0
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    def _refill(self, now: float):
+        rate = self.rate * self._factor
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * rate)
+        self._updated = now
+
+    async def acquire(self):
+        """取得一次请求许可。熔断期间抛出 CircuitOpenError。"""
+        if self.is_open:
+            self.rejected += 1
+            raise CircuitOpenError(
+                f"{self.name} 接口已熔断，{self._open_until - time.monotonic():.0f} 秒后恢复"
+            )
+        async with self._lock:
+            while True:
+                if self.is_open:
+                    # 排队期间触发了熔断
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} 接口已熔断")
+                now = time.monotonic()
+                if now < self._paused_until:
+                    self.throttled += 1
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                self.throttled += 1
+                await asyncio.sleep((1 - self._tokens) / (self.rate * self._factor))
+
+    def on_success(self):
+        self._failures = 0
+        if self._factor < 1:
+            self._factor = min(1.0, self._factor * 2)
+            if self._factor >= 1:
+                self._trips = 0
+                logger.info(f"{self.name} 接口已恢复全速请求。")
+
+    def on_risk_control(self, code: int):
+        """记录一次风控，设置退避或熔断。"""
+        self.risk_events += 1
+        self._failures += 1
+        now = time.monotonic()
+        if self._failures >= self.breaker_threshold:
+            self._trips += 1
+            cooldown = self.cooldown * 2 ** min(self._trips - 1, 3)
+            self._open_until = self._paused_until = now + cooldown
+            self._failures = 0
+            self._factor = self.RECOVERY_START
+            self._tokens = 0
+            self._updated = self._open_until
+            logger.warning(
+                f"{self.name} 接口连续触发风控 ({code})，暂停请求 {cooldown:.0f} 秒。"
+            )
+            return
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (self._failures - 1))
+        delay = random.uniform(delay / 2, delay)
+        self._paused_until = max(self._paused_until, now + delay)
+        logger.warning(f"{self.name} 接口触发风控 ({code})，退避 {delay:.1f} 秒。")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open": self.is_open,
+            "rate_factor": self._factor,
+            "throttled": self.throttled,
+            "risk_events": self.risk_events,
+            "rejected": self.rejected,
+        }
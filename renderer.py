@@ -1,13 +1,82 @@
 import os
+import json
 import asyncio
+import hashlib
+from contextlib import asynccontextmanager
 from .utils import *
-from typing import Dict, Any
+from typing import Dict, Any, Optional, AsyncIterator
 from astrbot.api import logger
 from astrbot.api.all import Star
-from .constant import TEMPLATE_PATH, LOGO_PATH, IMG_PATH, MAX_ATTEMPTS, RETRY_DELAY
+from astrbot.api.star import StarTools
+from .assets import AssetCache
+from .cache import DiskLRUCache, SingleFlight
+from .native_renderer import NativeCardRenderer, is_simple_card
+from .http_session import HttpSessionManager
+from .metrics import metrics
+from .constant import (
+    TEMPLATE_PATH,
+    MAX_ATTEMPTS,
+    RETRY_DELAY,
+    OUTPUT_FORMATS,
+    OUTPUT_FORMAT_DEFAULTS,
+)
 
 with open(TEMPLATE_PATH, "r", encoding="utf-8") as file:
     HTML_TEMPLATE = file.read()
+# 模板变化后旧的渲染缓存自动失效
+TEMPLATE_VERSION = hashlib.sha1(HTML_TEMPLATE.encode("utf-8")).hexdigest()[:12]
+# 动态类型对应的卡片类别，用于选择输出格式
+CARD_KINDS = {
+    "DYNAMIC_TYPE_DRAW": "draw",
+    "DYNAMIC_TYPE_WORD": "draw",
+    "DYNAMIC_TYPE_AV": "video",
+    "DYNAMIC_TYPE_ARTICLE": "article",
+    "DYNAMIC_TYPE_FORWARD": "forward",
+}
+
+
+def _has_images(data: Dict[str, Any]) -> bool:
+    return any(not is_logo_placeholder(src) for src in data.get("image_urls") or [])
+
+
+def card_kind(render_data: Dict[str, Any]) -> str:
+    """
+    卡片类别：不含配图的卡片为 text，其余按动态类型区分，没有类型的为 notice。
+    rai 配置下代替配图的 Logo 不算作配图。
+    """
+    forward = render_data.get("forward") or {}
+    if not _has_images(render_data) and not _has_images(forward):
+        return "text"
+    return CARD_KINDS.get(render_data.get("type"), "notice")
+
+
+class RenderJob:
+    """
+    一次渲染任务的产物。
+    渲染结果写入任务独有的文件，发送完成后调用 release() 删除；
+    来自缓存的文件只在使用期间锁定，不会被删除。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        cache: Optional[DiskLRUCache] = None,
+        key: Optional[str] = None,
+    ):
+        self.path = path
+        self._cache = cache
+        self._key = key
+        if cache and key:
+            cache.pin(key)
+
+    def release(self):
+        if self.path is None:
+            return
+        if self._cache and self._key:
+            self._cache.unpin(self._key)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
 
 
 class Renderer:
@@ -15,44 +84,200 @@ class Renderer:
     负责将动态数据渲染成图片。
     """
 
-    def __init__(self, star_instance: Star, rai: bool, t2i_url: str):
+    def __init__(
+        self,
+        star_instance: Star,
+        rai: bool,
+        t2i_url: str,
+        cache_mb: float = 0,
+        workers: int = 2,
+        http: Optional[HttpSessionManager] = None,
+        backend: str = "auto",
+        font_path: str = "",
+        asset_cache_mb: float = 0,
+        image_mode: str = "downscale",
+        output_format: Optional[Dict[str, Any]] = None,
+    ):
         """
         初始化渲染器。
+        cache_mb: 渲染结果缓存的容量上限(MB)，为 0 时不缓存
+        workers: 同时进行的渲染数上限
+        http: 共享的 HTTP 会话，用于请求 t2i 接口与下载截图
+        backend: html 为 HTML 渲染，native 为 Pillow 直接绘制，auto 为简单卡片使用 native
+        font_path: native 渲染使用的字体，为空时自动查找
+        asset_cache_mb: 头像、封面等渲染素材的本地缓存容量(MB)，为 0 时不缓存
+        image_mode: 配图预处理方式，downscale 缩小到显示尺寸，collage 另将多图拼成一张，off 不处理（需启用素材缓存）
+        output_format: 各类卡片的输出格式与压缩质量，见 OUTPUT_FORMAT_DEFAULTS
         """
         self.star = star_instance
+        self.backend = backend
+        self.image_mode = image_mode
+        self.formats = dict(OUTPUT_FORMAT_DEFAULTS)
+        for kind, fmt in (output_format or {}).items():
+            if kind == "quality" or fmt in OUTPUT_FORMATS:
+                self.formats[kind] = fmt
+            else:
+                logger.warning(f"不支持的输出格式 {kind}: {fmt}，使用默认值。")
+        self.quality = min(100, max(1, int(self.formats["quality"])))
+        self.native: Optional[NativeCardRenderer] = None
+        if backend in ("auto", "native"):
+            self.native = NativeCardRenderer(font_path)
+        self.http = http
         self.rai = rai
         self.t2i_url = t2i_url
+        self._workers = asyncio.Semaphore(max(1, int(workers)))
+        # 同一份渲染数据的并发渲染只执行一次（仅在启用缓存时，结果需要落入缓存才能共享）
+        self._flight = SingleFlight()
+        self.cache: Optional[DiskLRUCache] = None
+        if cache_mb > 0:
+            cache_dir = os.path.join(
+                StarTools.get_data_dir(plugin_name="astrbot_plugin_bilibili"),
+                "render_cache",
+            )
+            # 缓存键带有文件后缀，不同格式的渲染结果共用一个目录
+            self.cache = DiskLRUCache(cache_dir, int(cache_mb * 1024 * 1024), suffix="")
+        self.assets: Optional[AssetCache] = None
+        if asset_cache_mb > 0:
+            asset_dir = os.path.join(
+                StarTools.get_data_dir(plugin_name="astrbot_plugin_bilibili"),
+                "asset_cache",
+            )
+            self.assets = AssetCache(
+                asset_dir, int(asset_cache_mb * 1024 * 1024), http=self.http
+            )
+
+    @property
+    def _session(self):
+        return self.http.session if self.http else None
 
-    async def render_dynamic(self, render_data: Dict[str, Any]):
+    def _use_native(self, render_data: Dict[str, Any]) -> bool:
+        if self.native is None or not self.native.available:
+            return False
+        return self.backend == "native" or is_simple_card(render_data)
+
+    def output_format(self, render_data: Dict[str, Any]) -> str:
+        return self.formats.get(card_kind(render_data), "png")
+
+    def cache_key(self, render_data: Dict[str, Any]) -> str:
+        """渲染数据的稳定哈希加输出文件后缀，包含模板版本、渲染后端与输出格式。"""
+        payload = json.dumps(
+            render_data, sort_keys=True, ensure_ascii=False, default=str
+        )
+        backend = "native" if self._use_native(render_data) else self.t2i_url
+        fmt = self.output_format(render_data)
+        raw = f"{TEMPLATE_VERSION}|{backend}|{self.image_mode}|{fmt}|{self.quality}|{payload}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest() + OUTPUT_FORMATS[fmt]
+
+    @asynccontextmanager
+    async def render(self, render_data: Dict[str, Any]) -> AsyncIterator[Optional[str]]:
         """
         将渲染数据字典渲染成最终图片。
-        这是该类的主要入口方法。
+        这是该类的主要入口方法，用法:
+            async with renderer.render(render_data) as img_path:
+                ...  # 发送 img_path，失败时为 None
+        退出上下文后图片文件随任务一并清理（缓存中的文件由缓存管理）。
         """
+        job = await self.render_dynamic(render_data)
+        try:
+            yield job.path
+        finally:
+            job.release()
+
+    async def render_dynamic(self, render_data: Dict[str, Any]) -> "RenderJob":
+        """
+        创建一个渲染任务。相同的渲染数据只渲染一次，之后直接复用缓存。
+        调用方在发送完成后必须调用 RenderJob.release()。
+        """
+        if not self.cache:
+            return RenderJob(await self._timed_render(render_data))
+
+        key = self.cache_key(render_data)
+        cached = self.cache.get(key)
+        if cached:
+            return RenderJob(cached, self.cache, key)
+        path = await self._flight.do(key, lambda: self._render_cached(key, render_data))
+        if path and os.path.exists(path):
+            return RenderJob(path, self.cache, key)
+        return RenderJob(None)
+
+    async def _render_cached(
+        self, key: str, render_data: Dict[str, Any]
+    ) -> Optional[str]:
+        output_path = await self._timed_render(render_data)
+        if output_path is None:
+            return None
+        return self.cache.put(key, output_path)
+
+    async def _timed_render(self, render_data: Dict[str, Any]) -> Optional[str]:
+        """实际执行一次渲染（未命中缓存），记录耗时与结果。"""
+        with metrics.timer("stage_seconds", stage="render"):
+            output_path = await self._render_to_file(render_data)
+        metrics.inc("renders_total", result="ok" if output_path else "failed")
+        return output_path
+
+    async def _render_to_file(self, render_data: Dict[str, Any]) -> Optional[str]:
+        """渲染并裁剪图片，成功时返回新生成的文件路径，全部尝试失败时返回 None。"""
+        native = self._use_native(render_data)
+        fmt = self.output_format(render_data)
+        suffix = OUTPUT_FORMATS[fmt]
+        if self.assets:
+            if self.image_mode != "off":
+                render_data = await self.assets.prepare_images(
+                    render_data, collage=self.image_mode == "collage"
+                )
+            # 原生绘制直接读取本地文件，HTML 渲染使用内联的 Data URI
+            render_data = await self.assets.localize(render_data, inline=not native)
+        if native:
+            output_path = bili_temp_path("render_", suffix)
+            try:
+                async with self._workers:
+                    if await self.native.render(
+                        render_data, output_path, self._session, fmt, self.quality
+                    ):
+                        return output_path
+            except Exception as e:
+                metrics.inc("render_fallbacks_total")
+                logger.error(f"原生渲染卡片失败，改用 HTML 渲染: {e}")
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
         for attempt in range(1, MAX_ATTEMPTS + 1):
             render_output = None
+            output_path = bili_temp_path("render_", suffix)
             try:
-                if not self.t2i_url:
-                    render_output = await self.star.html_render(
-                        HTML_TEMPLATE, render_data, False
-                    )
-                else:
-                    render_output = await bili_html_render(
-                        HTML_TEMPLATE, render_data, self.t2i_url
-                    )
-                if (
-                    render_output
-                    and os.path.exists(render_output)
-                    and os.path.getsize(render_output) > 0
-                ):
-                    await get_and_crop_image(render_output, IMG_PATH)
-                    return IMG_PATH  # 成功，返回图片路径
+                async with self._workers:
+                    if not self.t2i_url:
+                        render_output = await self.star.html_render(
+                            HTML_TEMPLATE, render_data, False
+                        )
+                    else:
+                        render_output = await bili_html_render(
+                            HTML_TEMPLATE, render_data, self.t2i_url, self._session
+                        )
+                    if (
+                        render_output
+                        and os.path.exists(render_output)
+                        and os.path.getsize(render_output) > 0
+                    ):
+                        await get_and_crop_image(
+                            render_output,
+                            output_path,
+                            session=self._session,
+                            fmt=fmt,
+                            quality=self.quality,
+                        )
+                if os.path.exists(output_path):
+                    return output_path  # 成功
             except Exception as e:
                 logger.error(f"渲染图片失败 (尝试次数: {attempt}): {e}")
+                if os.path.exists(output_path):
+                    os.remove(output_path)
             finally:
                 if render_output and os.path.exists(render_output):
                     os.remove(render_output)
 
             if attempt < MAX_ATTEMPTS:
+                metrics.inc("render_retries_total")
                 await asyncio.sleep(RETRY_DELAY)
 
         return None  # 所有尝试都失败
@@ -118,7 +343,7 @@ class Renderer:
             render_data["title"] = opus["title"]
             render_data["image_urls"] = [pic["url"] for pic in opus["pics"][:9]]
             if not render_data["image_urls"] and self.rai:
-                render_data["image_urls"] = [await image_to_base64(LOGO_PATH)]
+                render_data["image_urls"] = [await logo_data_uri()]
             if not is_forward:
                 url = f"https:{jump_url}"
                 render_data["qrcode"] = await create_qrcode(url)
@@ -0,0 +1,16 @@
+"""
+插件以包的形式被 AstrBot 加载（模块间使用相对导入）。
+测试时将仓库根目录注册为 astrbot_plugin_bilibili 包，无需把仓库放到 data/plugins 下。
+"""
+
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "astrbot_plugin_bilibili"
+
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ROOT]
+    sys.modules[PACKAGE] = package
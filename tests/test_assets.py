@@ -0,0 +1,35 @@
+"""渲染素材缓存：localize() 只内联缓存目录中的本地文件。"""
+
+import asyncio
+import os
+
+from PIL import Image
+
+from astrbot_plugin_bilibili.assets import AssetCache
+
+
+def test_local_paths_in_text_are_not_read(tmp_path):
+    secret = tmp_path / "secret.txt"
+    secret.write_text("host secret")
+    cache = AssetCache(str(tmp_path / "assets"), 1 << 20)
+    text = f"hi<img src='{secret}'>"
+    data = {"text": text, "image_urls": [str(secret)], "avatar": str(secret)}
+
+    assert cache.collect_urls(data) == []
+    result = asyncio.run(cache.localize(data))
+    assert result["text"] == text
+    assert result["image_urls"] == [str(secret)]
+    assert "host secret" not in repr(result)
+
+
+def test_cached_thumbnails_are_inlined(tmp_path):
+    directory = tmp_path / "assets"
+    cache = AssetCache(str(directory), 1 << 20)
+    thumb = str(directory / "thumb.img")
+    Image.new("RGB", (4, 4)).save(thumb, "PNG")
+    text = f"<img src='{thumb}'>"
+    data = {"text": text, "image_urls": [], "forward": {"image_urls": [thumb]}}
+
+    result = asyncio.run(cache.localize(data))
+    assert result["forward"]["image_urls"][0].startswith("data:image/png;base64,")
+    assert result["text"] == text  # 正文中的本地路径不替换
@@ -0,0 +1,23 @@
+"""按卡片类别选择输出格式时的分类。"""
+
+import asyncio
+
+from astrbot_plugin_bilibili.renderer import card_kind
+from astrbot_plugin_bilibili.utils import logo_data_uri
+
+
+def test_logo_placeholder_is_not_an_image():
+    logo = asyncio.run(logo_data_uri())
+    word = {"type": "DYNAMIC_TYPE_WORD", "image_urls": [logo]}
+    assert card_kind(word) == "text"
+    forward = {"type": "DYNAMIC_TYPE_FORWARD", "image_urls": [], "forward": word}
+    assert card_kind(forward) == "text"
+
+
+def test_cards_with_pictures_use_dynamic_type():
+    draw = {"type": "DYNAMIC_TYPE_DRAW", "image_urls": ["https://i0.hdslb.com/a.jpg"]}
+    assert card_kind(draw) == "draw"
+    forward = {"type": "DYNAMIC_TYPE_FORWARD", "image_urls": [], "forward": draw}
+    assert card_kind(forward) == "forward"
+    assert card_kind({"image_urls": ["https://i0.hdslb.com/b.png"]}) == "notice"
+    assert card_kind({"type": "DYNAMIC_TYPE_AV", "image_urls": []}) == "text"
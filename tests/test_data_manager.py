@@ -0,0 +1,37 @@
+"""订阅数据的持久化：更新后重启仍保持订阅的添加顺序。"""
+
+import asyncio
+
+from astrbot_plugin_bilibili import data_manager
+from astrbot_plugin_bilibili.data_manager import DataManager
+
+
+def _open(monkeypatch, tmp_path) -> DataManager:
+    monkeypatch.setattr(
+        data_manager.StarTools, "get_data_dir", lambda plugin_name=None: str(tmp_path)
+    )
+    return DataManager()
+
+
+def test_updates_keep_insertion_order(monkeypatch, tmp_path):
+    async def run():
+        dm = _open(monkeypatch, tmp_path)
+        for uid in (3, 1, 2):
+            await dm.add_subscription(
+                "a", {"uid": uid, "last": "", "filter_types": [], "filter_regex": []}
+            )
+        await dm.update_last_dynamic_id("a", 3, "100")
+        await dm.update_live_status("a", 3, True)
+        await dm.update_subscription("a", 1, ["live"], ["抽奖"])
+        await dm.close()
+
+        dm = _open(monkeypatch, tmp_path)
+        try:
+            subs = dm.get_subscriptions_by_user("a")
+            assert [sub["uid"] for sub in subs] == [3, 1, 2]
+            assert subs[0]["last"] == "100" and subs[0]["is_live"] is True
+            assert subs[1]["filter_regex"] == ["抽奖"]
+        finally:
+            await dm.close()
+
+    asyncio.run(run())
@@ -0,0 +1,34 @@
+"""订阅过滤条件的预编译与匹配。"""
+
+from astrbot_plugin_bilibili.filters import FILTER_BITS, CompiledFilter
+
+
+def test_backreferences_still_match_when_combined():
+    flt = CompiledFilter([], [r"(a)\1", r"(b)\1"])
+    assert flt.search("bb") == r"(b)\1"
+    assert flt.search("aa") == r"(a)\1"
+    assert flt.search("ab") is None
+
+
+def test_named_backreference_and_plain_patterns_mixed():
+    flt = CompiledFilter([], ["抽奖", r"(?P<w>哈)(?P=w)", "广告"])
+    assert flt.search("哈哈哈") == r"(?P<w>哈)(?P=w)"
+    assert flt.search("恰饭广告") == "广告"
+    assert flt.search("互动抽奖 广告") == "抽奖"  # 按配置顺序返回第一条
+    assert flt.search("普通动态") is None
+
+
+def test_inline_flags_fall_back_to_one_by_one():
+    flt = CompiledFilter([], ["(?i)LIVE", "直播"])
+    assert flt.search("live now") == "(?i)LIVE"
+    assert flt.search("今晚直播") == "直播"
+    assert flt.search("视频") is None
+
+
+def test_invalid_patterns_are_ignored_and_types_masked():
+    flt = CompiledFilter(["draw", "lottery"], ["(", "抽奖"])
+    assert flt.patterns == ["抽奖"]
+    assert flt.blocks(FILTER_BITS["draw"])
+    assert flt.blocks(FILTER_BITS["video"] | FILTER_BITS["lottery"])
+    assert not flt.blocks(FILTER_BITS["video"])
+    assert flt.search("") is None
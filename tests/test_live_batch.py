@@ -0,0 +1,222 @@
+"""批量直播状态：在本地假接口上验证分块、结果映射、风控重试与状态变化的推送判断。"""
+
+import asyncio
+
+from aiohttp import web
+
+from astrbot_plugin_bilibili.bili_client import BiliClient
+from astrbot_plugin_bilibili.constant import LIVE_BATCH_SIZE
+from astrbot_plugin_bilibili.filters import CompiledFilter
+from astrbot_plugin_bilibili.listener import DynamicListener
+
+
+class FakeLiveApi:
+    """
+    模拟 get_status_info_by_uids。rooms 中的 UID 视为已开通直播间，
+    responses 中预置的响应按顺序优先返回（用于模拟风控）。
+    """
+
+    def __init__(self, rooms=None, responses=None):
+        self.rooms = rooms or {}
+        self.responses = list(responses or [])
+        self.requests = []
+        self.runner = None
+        self.url = ""
+
+    async def handle(self, request: web.Request) -> web.Response:
+        uids = request.query.getall("uids[]", [])
+        self.requests.append(uids)
+        if self.responses:
+            return web.json_response(self.responses.pop(0))
+        data = {
+            uid: {
+                "uid": int(uid),
+                "uname": f"UP{uid}",
+                "room_id": 1000 + int(uid),
+                "live_status": self.rooms[int(uid)],
+                "title": "直播中",
+            }
+            for uid in uids
+            if int(uid) in self.rooms
+        }
+        # 没有任何直播间时接口返回空列表而不是空对象
+        return web.json_response({"code": 0, "message": "0", "data": data or []})
+
+    async def __aenter__(self) -> "FakeLiveApi":
+        app = web.Application()
+        app.router.add_get("/status", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/status"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+class FakeDataManager:
+    """只实现直播检查用到的接口，订阅数据以 {(session, uid): sub_data} 保存。"""
+
+    version = 1
+
+    def __init__(self, subs):
+        self.subs = subs
+        self.live_updates = []
+
+    def get_subscribed_uids(self):
+        return {uid for _, uid in self.subs}
+
+    def get_subscribers(self, uid):
+        return [(s, d) for (s, u), d in self.subs.items() if u == uid]
+
+    def get_filter(self, sub_user, uid):
+        return CompiledFilter.from_sub(self.subs[(sub_user, uid)])
+
+    async def update_live_status(self, sub_user, uid, is_live):
+        self.live_updates.append((sub_user, uid, is_live))
+
+    async def flush(self):
+        pass
+
+
+def _listener(client, data_manager, **kwargs):
+    return DynamicListener(
+        context=None,
+        data_manager=data_manager,
+        bili_client=client,
+        renderer=None,
+        interval_mins=20,
+        rai=True,
+        node=False,
+        **kwargs,
+    )
+
+
+def test_status_mapping_and_empty_list():
+    async def run():
+        async with FakeLiveApi(rooms={1: 1, 2: 0}) as api:
+            client = BiliClient(live_status_api=api.url)
+            try:
+                statuses = await client.get_live_status_batch([1, 2, 3])
+                assert set(statuses) == {1, 2}
+                assert statuses[1]["live_status"] == 1
+                assert statuses[2]["uname"] == "UP2"
+                # data 为空列表（均未开通直播间）
+                assert await client.get_live_status_batch([7, 8]) == {}
+                assert await client.get_live_status_batch([]) == {}
+                assert api.requests == [["1", "2", "3"], ["7", "8"]]
+            finally:
+                await client.close()
+
+    asyncio.run(run())
+
+
+def test_risk_control_backoff_and_single_retry():
+    async def run():
+        risk = {"code": -412, "message": "请求被拦截", "data": None}
+        async with FakeLiveApi(rooms={1: 1}, responses=[risk]) as api:
+            client = BiliClient(live_status_api=api.url)
+            limiter = client.limiters["live"]
+            limiter.backoff_base = 0.05
+            try:
+                statuses = await client.get_live_status_batch([1])
+                assert set(statuses) == {1}
+                assert statuses[1]["live_status"] == 1
+                assert len(api.requests) == 2  # 风控后退避并重试一次
+                assert limiter.risk_events == 1
+                assert limiter.throttled >= 1  # 重试等待了退避时间
+
+                # 连续两次风控：只重试一次，随后放弃
+                api.responses = [risk, risk]
+                assert await client.get_live_status_batch([1]) is None
+                assert len(api.requests) == 4
+                assert limiter.risk_events == 3
+            finally:
+                await client.close()
+
+    asyncio.run(run())
+
+
+def test_batch_is_chunked():
+    async def run():
+        uids = list(range(1, LIVE_BATCH_SIZE * 2 + 6))
+        subs = {("group", uid): {"uid": uid, "is_live": False} for uid in uids}
+        async with FakeLiveApi() as api:
+            client = BiliClient(live_status_api=api.url)
+            try:
+                await _listener(client, FakeDataManager(subs))._check_live_batch()
+            finally:
+                await client.close()
+        assert [len(r) for r in api.requests] == [LIVE_BATCH_SIZE, LIVE_BATCH_SIZE, 5]
+        requested = [int(uid) for r in api.requests for uid in r]
+        assert sorted(requested) == uids
+
+    asyncio.run(run())
+
+
+def test_only_changed_subscriptions_are_notified():
+    async def run():
+        subs = {
+            ("a", 1): {"uid": 1, "is_live": False},  # 开播 -> 通知
+            ("b", 1): {"uid": 1, "is_live": True},  # 已知在播 -> 不通知
+            ("c", 1): {"uid": 1, "is_live": False, "filter_types": ["live"]},
+            ("a", 2): {"uid": 2, "is_live": True},  # 下播 -> 通知
+            ("b", 2): {"uid": 2, "is_live": False},  # 已知未播 -> 不通知
+            ("a", 3): {"uid": 3, "is_live": True},  # 未开通直播间 -> 跳过
+        }
+        async with FakeLiveApi(rooms={1: 1, 2: 0}) as api:
+            client = BiliClient(live_status_api=api.url)
+            listener = _listener(client, FakeDataManager(subs))
+            calls = []
+
+            async def handle(sub_user, sub_data, live_info):
+                calls.append(
+                    (sub_user, sub_data["uid"], live_info["live_room"]["liveStatus"])
+                )
+
+            listener._handle_live_status = handle
+            try:
+                await listener._check_live_chunk([1, 2, 3])
+            finally:
+                await client.close()
+        assert sorted(calls) == [("a", 1, 1), ("a", 2, 0)]
+
+    asyncio.run(run())
+
+
+def test_live_start_promotes_next_dynamics_poll():
+    async def run():
+        subs = {
+            ("a", 1): {"uid": 1, "is_live": False},
+            ("a", 2): {"uid": 2, "is_live": False},
+        }
+        async with FakeLiveApi(rooms={1: 1, 2: 0}) as api:
+            client = BiliClient(live_status_api=api.url)
+            listener = _listener(
+                client,
+                FakeDataManager(subs),
+                hot_interval_mins=5,
+                cold_interval_mins=60,
+            )
+
+            async def handle(sub_user, sub_data, live_info):
+                pass
+
+            listener._handle_live_status = handle
+            listener._refresh_subscribers()
+            cold = listener.activity.intervals["cold"]
+            for uid in (1, 2):
+                listener.scheduler.reschedule(uid, cold)
+            try:
+                await listener._check_live_chunk([1, 2])
+            finally:
+                await client.close()
+        hot = listener.activity.intervals["hot"]
+        assert listener.activity.tier(1) == "hot"
+        assert listener.scheduler.next_due(1) <= hot  # 开播后立即提前
+        assert listener.scheduler.next_due(2) > hot  # 未开播的保持原计划
+
+    asyncio.run(run())
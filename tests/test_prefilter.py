@@ -0,0 +1,32 @@
+"""小程序卡片的预筛：字符串与框架已解析的 dict 两种形式。"""
+
+import json
+
+from astrbot_plugin_bilibili.utils import maybe_bili_miniapp
+
+BILI_CARD = {
+    "app": "com.tencent.miniapp_01",
+    "meta": {
+        "detail_1": {
+            "title": "哔哩哔哩",
+            "desc": "视频标题",
+            "qqdocurl": "https://b23.tv/abcdefg",
+        }
+    },
+}
+NEWS_CARD = {"meta": {"news": {"tag": "哔哩哔哩", "jumpUrl": "https://b23.tv/x"}}}
+MAP_CARD = {"meta": {"detail_1": {"title": "腾讯地图", "desc": "位置分享"}}}
+
+
+def test_dict_cards():
+    assert maybe_bili_miniapp(BILI_CARD)
+    assert maybe_bili_miniapp(NEWS_CARD)
+    assert not maybe_bili_miniapp(MAP_CARD)
+    assert not maybe_bili_miniapp({"meta": "invalid"})
+    assert not maybe_bili_miniapp({})
+
+
+def test_string_cards():
+    assert maybe_bili_miniapp(json.dumps(BILI_CARD))
+    assert not maybe_bili_miniapp(json.dumps(MAP_CARD, ensure_ascii=False))
+    assert not maybe_bili_miniapp(None)
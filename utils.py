@@ -3,18 +3,65 @@ import PIL
 import aiohttp
 import qrcode
 import io
+import re
 import base64
 import os
 from urllib.parse import urlparse
-from .constant import CURRENT_DIR
-import ssl
+from .constant import (
+    BV,
+    LOGO_PATH,
+    MINIAPP_HINTS,
+    MINIAPP_SOURCE,
+    QRCODE_CACHE_SIZE,
+    TEMP_DIR,
+)
+from .cache import LRUCache
+from .http_session import default_ssl_context
+from .metrics import metrics
 import time
 import uuid
-from io import BytesIO
-from typing import Union
-import certifi
+import asyncio
+from typing import Union, Optional, Callable, Any, Dict
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 from PIL import Image as PILImage
 
+# 图片解码、编码等 CPU 密集操作所用的执行器，None 表示使用事件循环默认的线程池
+_image_executor: Optional[Executor] = None
+# 二维码只取决于 URL，按 URL 缓存生成好的 Data URI
+_qrcode_cache = LRUCache(QRCODE_CACHE_SIZE)
+# 静态 Logo 的 Data URI，首次使用时计算
+_logo_data_uri: Optional[str] = None
+_logo_hits = 0
+
+
+def configure_image_executor(kind: str = "thread", workers: int = 2):
+    """
+    配置图片处理执行器。
+    kind: "thread" 使用线程池，"process" 使用进程池（可绕开 GIL，但有序列化开销）
+    """
+    global _image_executor
+    shutdown_image_executor()
+    workers = max(1, int(workers))
+    if kind == "process":
+        _image_executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        _image_executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="bili_image"
+        )
+
+
+def shutdown_image_executor():
+    global _image_executor
+    if _image_executor is not None:
+        _image_executor.shutdown(wait=False, cancel_futures=True)
+        _image_executor = None
+
+
+async def run_image_task(func: Callable[..., Any], *args) -> Any:
+    """在图片执行器中运行同步函数，避免阻塞事件循环。"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_image_executor, func, *args)
+
 
 async def create_render_data() -> dict:
     return {
@@ -29,13 +76,7 @@ async def create_render_data() -> dict:
     }
 
 
-async def image_to_base64(image_source, mime_type: str = "image/png") -> str:
-    """
-    将图片对象或文件路径转为Base64 Data URI
-    :param image_source: PIL Image对象 或 图片文件路径
-    :param mime_type: 图片MIME类型，默认image/png
-    :return: Base64 Data URI字符串
-    """
+def _image_to_base64_sync(image_source, mime_type: str = "image/png") -> str:
     buffer = io.BytesIO()
 
     # 处理PIL Image对象
@@ -52,9 +93,17 @@ async def image_to_base64(image_source, mime_type: str = "image/png") -> str:
     return f"data:{mime_type};base64,{base64_str}"
 
 
-async def create_qrcode(url):
-    if not is_valid_url(url):
-        return ""
+async def image_to_base64(image_source, mime_type: str = "image/png") -> str:
+    """
+    将图片对象或文件路径转为Base64 Data URI
+    :param image_source: PIL Image对象 或 图片文件路径
+    :param mime_type: 图片MIME类型，默认image/png
+    :return: Base64 Data URI字符串
+    """
+    return await run_image_task(_image_to_base64_sync, image_source, mime_type)
+
+
+def _create_qrcode_sync(url: str) -> str:
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -64,25 +113,152 @@ async def create_qrcode(url):
     qr.add_data(url)
     qr.make(fit=True)
     qr_image = qr.make_image(fill_color="#EC88EC", back_color="#F2F6FF")
-    url = await image_to_base64(qr_image)
-    return url
+    return _image_to_base64_sync(qr_image)
 
 
-async def get_and_crop_image(src, output_path, width=700):
-    if src.startswith(("http://", "https://")):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(src, timeout=10) as response:
-                if response.status != 200:
-                    return
-                data = await response.read()
-                image = PIL.Image.open(io.BytesIO(data))
+async def create_qrcode(url):
+    if not is_valid_url(url):
+        return ""
+    data_uri = _qrcode_cache.get(url)
+    if data_uri is None:
+        with metrics.timer("stage_seconds", stage="qrcode"):
+            data_uri = await run_image_task(_create_qrcode_sync, url)
+        _qrcode_cache.set(url, data_uri)
+    return data_uri
+
+
+async def logo_data_uri() -> str:
+    """Astrbot Logo 的 Data URI，只读取并编码一次。"""
+    global _logo_data_uri, _logo_hits
+    if _logo_data_uri is None:
+        _logo_data_uri = await image_to_base64(LOGO_PATH)
+    else:
+        _logo_hits += 1
+    return _logo_data_uri
+
+
+def is_logo_placeholder(src: str) -> bool:
+    """是否为 rai 配置下代替配图的 Logo。"""
+    return _logo_data_uri is not None and src == _logo_data_uri
+
+
+def image_cache_stats() -> Dict[str, Dict[str, int]]:
+    """二维码与 Logo 缓存的命中统计。"""
+    return {
+        "qrcode": _qrcode_cache.stats(),
+        "logo": {
+            "entries": int(_logo_data_uri is not None),
+            "hits": _logo_hits,
+            "misses": int(_logo_data_uri is not None),
+        },
+    }
+
+
+def save_image(
+    image: PILImage.Image, output_path: str, fmt: str = "png", quality: int = 85
+):
+    """
+    按输出格式编码图片。
+    fmt: png / png8（调色板量化，适合纯文字卡片）/ jpeg（渐进式）/ webp
+    quality: jpeg 与 webp 的压缩质量
+    """
+    if fmt == "png":
+        image.save(output_path, "PNG")
+        return
+    if image.mode != "RGB":
+        # 卡片没有透明区域，透明像素按白色背景合成
+        background = PILImage.new("RGB", image.size, "white")
+        if "A" in image.getbands():
+            background.paste(image, mask=image.getchannel("A"))
+        else:
+            background.paste(image.convert("RGB"))
+        image = background
+    if fmt == "png8":
+        image.quantize(256, method=PILImage.Quantize.FASTOCTREE).save(
+            output_path, "PNG"
+        )
+    elif fmt == "jpeg":
+        image.save(
+            output_path, "JPEG", quality=quality, progressive=True, optimize=True
+        )
+    elif fmt == "webp":
+        image.save(output_path, "WEBP", quality=quality, method=4)
+    else:
+        raise ValueError(f"不支持的输出格式: {fmt}")
+
+
+def _crop_image_sync(
+    src: Union[bytes, str],
+    output_path: str,
+    width: int,
+    fmt: str = "png",
+    quality: int = 85,
+) -> bool:
+    if isinstance(src, bytes):
+        image = PIL.Image.open(io.BytesIO(src))
     else:
         if not os.path.exists(src):
-            return
+            return False
         image = PIL.Image.open(src)
-    w, h = image.size
-    cropped = image.crop((0, 0, min(width, w), h))
-    cropped.save(output_path)
+    with image:
+        w, h = image.size
+        cropped = image.crop((0, 0, min(width, w), h))
+        save_image(cropped, output_path, fmt, quality)
+    return True
+
+
+async def get_and_crop_image(
+    src,
+    output_path,
+    width=700,
+    session: Optional[aiohttp.ClientSession] = None,
+    fmt: str = "png",
+    quality: int = 85,
+):
+    if src.startswith(("http://", "https://")):
+        if session is None:
+            async with aiohttp.ClientSession() as session:
+                return await get_and_crop_image(
+                    src, output_path, width, session, fmt, quality
+                )
+        async with session.get(src, timeout=10) as response:
+            if response.status != 200:
+                return
+            src = await response.read()
+    await run_image_task(_crop_image_sync, src, output_path, width, fmt, quality)
+
+
+_BV_RE = re.compile(BV)
+
+
+def extract_bvid(text: str) -> Optional[str]:
+    """从视频链接或 BV 号开头的消息中提取 BV 号。"""
+    match_ = _BV_RE.match(text.strip())
+    if not match_:
+        return None
+    return match_.group(1) or match_.group(2)
+
+
+def maybe_bili_miniapp(data: Union[str, dict]) -> bool:
+    """
+    预筛：只有可能是 B 站分享卡片的消息才值得完整处理。
+    字符串在解析 JSON 前做子串检查；框架已解析为 dict 时只查看卡片来源字段。
+    """
+    if isinstance(data, dict):
+        meta = data.get("meta")
+        if not isinstance(meta, dict):
+            return False
+        detail_1 = meta.get("detail_1")
+        news = meta.get("news")
+        return (
+            isinstance(detail_1, dict) and detail_1.get("title") == MINIAPP_SOURCE
+        ) or (isinstance(news, dict) and news.get("tag") == MINIAPP_SOURCE)
+    if not isinstance(data, str):
+        return False
+    for hint in MINIAPP_HINTS:
+        if hint in data:
+            return True
+    return False
 
 
 def is_valid_url(url: str) -> bool:
@@ -120,7 +296,12 @@ async def parse_rich_text(summary, topic):
     return text
 
 
-async def bili_html_render(tmpl_str: str, tmpl_data: dict, api_url: str):
+async def bili_html_render(
+    tmpl_str: str,
+    tmpl_data: dict,
+    api_url: str,
+    session: Optional[aiohttp.ClientSession] = None,
+):
     post_data = {
         "tmpl": tmpl_str,
         "json": False,
@@ -132,69 +313,62 @@ async def bili_html_render(tmpl_str: str, tmpl_data: dict, api_url: str):
         },
     }
     url = f"{api_url}/generate"
-    return await bili_download_image_by_url(url, post_data)
+    return await bili_download_image_by_url(url, post_data, session)
 
 
-async def bili_download_image_by_url(url: str, post_data: dict = None) -> str:
+async def bili_download_image_by_url(
+    url: str,
+    post_data: dict = None,
+    session: Optional[aiohttp.ClientSession] = None,
+) -> str:
     """
     取自astrbot/core/utils/io.py
+    session: 复用的会话，未提供时临时创建
     """
-    try:
-        # 使用 certifi 提供的 CA 证书
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
+    if session is None:
+        connector = aiohttp.TCPConnector(ssl=default_ssl_context())
         async with aiohttp.ClientSession(
             trust_env=True, connector=connector
         ) as session:
-            async with session.post(url, json=post_data) as resp:
-                resp.raise_for_status()
-                return bili_save_temp_img(await resp.read())
+            return await bili_download_image_by_url(url, post_data, session)
+
+    try:
+        async with session.post(url, json=post_data) as resp:
+            resp.raise_for_status()
+            return await bili_save_temp_img(await resp.read())
 
     except (aiohttp.ClientConnectorSSLError, aiohttp.ClientConnectorCertificateError):
-        async with aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(ssl=False)
-        ) as session:
-            async with session.post(url, json=post_data) as resp:
-                resp.raise_for_status()
-                return bili_save_temp_img(await resp.read())
+        async with session.post(url, json=post_data, ssl=False) as resp:
+            resp.raise_for_status()
+            return await bili_save_temp_img(await resp.read())
 
-    except Exception as e:
-        raise e
+
+def bili_temp_path(prefix: str = "", suffix: str = ".png") -> str:
+    """
+    在插件临时目录下生成一个唯一的文件路径，供并发任务各自写入。
+    目录中的过期文件由后台的 TempJanitor 清理。
+    """
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    timestamp = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+    return os.path.join(TEMP_DIR, f"{prefix}{timestamp}{suffix}")
 
 
-def bili_save_temp_img(img: Union[PILImage.Image, bytes]) -> str:
+async def bili_save_temp_img(img: Union[PILImage.Image, bytes]) -> str:
     """
     取自astrbot/core/utils/io.py
     """
-    temp_dir = os.path.join(CURRENT_DIR, "temp")
-    if not os.path.exists(temp_dir):
-        os.makedirs(temp_dir)
+    return await run_image_task(_save_temp_img_sync, img)
 
-    # 清理超过 12 小时的旧临时文件
-    try:
-        for f in os.listdir(temp_dir):
-            file_path = os.path.join(temp_dir, f)
-            if os.path.isfile(file_path):
-                ctime = os.path.getctime(file_path)
-                if time.time() - ctime > 3600 * 12:
-                    os.remove(file_path)
-    except Exception as e:
-        print(f"清理临时文件失败: {e}")
 
-    timestamp = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
-    png_path = os.path.join(temp_dir, f"{timestamp}.png")
+def _save_temp_img_sync(img: Union[PILImage.Image, bytes]) -> str:
+    png_path = bili_temp_path()
 
     if isinstance(img, PILImage.Image):
         img.save(png_path, "PNG")
     elif isinstance(img, bytes):
-        try:
-            with PILImage.open(BytesIO(img)) as image_obj:
-                image_obj.save(png_path, "PNG")
-        except Exception as e:
-            # 如果 Pillow 无法解析，则直接写入二进制数据
-            print(f"无法将字节流作为图片解析，将直接写入文件。错误: {e}")
-            with open(png_path, "wb") as f:
-                f.write(img)
+        # t2i 服务返回的已是 PNG，直接写入，由后续裁剪步骤解码
+        with open(png_path, "wb") as f:
+            f.write(img)
     else:
         raise TypeError(f"不支持的输入类型: {type(img)}")
 